@@ -3,8 +3,15 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, time
 import os
+import threading
+import multiprocessing
 import xlsxwriter
 from excel_exporter import excel_exporter
+from flat_exporter import flat_exporter
+from access_log_processor import AccessLogProcessor
+from attendance_rollup import AttendanceRollup
+from employee_search_index import EmployeeSearchIndex
+from occupancy_analysis import OccupancyAnalyzer
 
 class AccessLogAnalyzer:
     def __init__(self, page):
@@ -15,8 +22,6 @@ class AccessLogAnalyzer:
         self.page.window_width = 1000
         self.page.window_height = 700
         
-        # 用於存儲編號與姓名的映射關係
-        self.id_name_map = {}
         # 开启debug模式
         self.debug_mode = False
         
@@ -26,6 +31,32 @@ class AccessLogAnalyzer:
         self.selected_name = None
         # 员工姓名列表
         self.employee_names = []
+        # 员工姓名/编号搜索索引，下拉菜单只显示最匹配的前几项
+        self.employee_search_index = EmployeeSearchIndex()
+        self.max_name_options = 20
+        # 预览读取的行数，以及用于丢弃过期后台分析结果的计数
+        self.preview_rows = 2000
+        self.load_generation = 0
+        # 后台分析共用同一个处理器，需依次执行
+        self.analysis_lock = threading.Lock()
+        # 保护界面状态（处理结果、汇总、表格、load_generation），
+        # 后台线程替换结果与界面事件处理不能同时进行
+        self.ui_lock = threading.RLock()
+        # 当前显示的是否为预览结果（预览不可导出）
+        self.showing_preview = False
+        # 员工 × 週/月的预先汇总结果
+        self.rollup = AttendanceRollup()
+        # 当前选中的汇总粒度（None表示显示明细，'occupancy'表示在场人数）
+        self.selected_granularity = None
+        # 每15分钟时段的在场人数
+        self.occupancy = OccupancyAnalyzer(slot_minutes=15)
+        # 日志加载与处理（合併30秒內同一编号的连续刷卡，已安装pyarrow时使用多线程解析CSV，大数据量时多进程处理）
+        self.processor = AccessLogProcessor(
+            debug_mode=self.debug_mode,
+            dedup_window_seconds=30,
+            csv_engine='auto',
+            parallel_workers=os.cpu_count() or 1
+        )
         
         # 用於顯示統計信息的Text組件
         self.stats_text = ft.Text("統計信息: 無數據", color="#cccccc", size=14)
@@ -51,6 +82,7 @@ class AccessLogAnalyzer:
             on_click=lambda _: self.file_picker.pick_files(
                 allowed_extensions=["csv"],
                 file_type=ft.FilePickerFileType.CUSTOM,
+                allow_multiple=True,
                 dialog_title="選擇門禁日誌CSV文件"
             ),
             bgcolor="#374151",  # 按鈕背景色
@@ -88,6 +120,15 @@ class AccessLogAnalyzer:
         
         # 名字篩選下拉菜單
         self.name_filter_label = ft.Text("篩選名字: ", color="#ffffff")
+        # 輸入姓名或編號即時搜尋
+        self.name_search = ft.TextField(
+            hint_text="搜尋姓名或編號",
+            on_change=self.on_name_search,
+            bgcolor="#374151",
+            color="#ffffff",
+            width=180,
+            dense=True
+        )
         self.name_filter = ft.Dropdown(
             options=[
                 ft.dropdown.Option("全部顯示")
@@ -99,9 +140,53 @@ class AccessLogAnalyzer:
             width=200
         )
         
+        # 彙總粒度下拉菜單
+        self.granularity_filter_label = ft.Text("彙總方式: ", color="#ffffff")
+        self.granularity_filter = ft.Dropdown(
+            options=[
+                ft.dropdown.Option("明細"),
+                ft.dropdown.Option("按週彙總"),
+                ft.dropdown.Option("按月彙總"),
+                ft.dropdown.Option("在場人數"),
+            ],
+            value="明細",
+            on_change=self.on_granularity_selected,
+            bgcolor="#374151",
+            color="#ffffff",
+            width=150
+        )
+        
+        # 彙總結果表格（默认隐藏）
+        self.rollup_columns = [
+            ft.DataColumn(ft.Text(col_name, color="#ffffff"))
+            for col_name in ["期間", "姓名", "遲到", "早退", "未進公司", "外出", "遲到分鐘", "工作時數"]
+        ]
+        self.rollup_table = ft.DataTable(
+            columns=self.rollup_columns,
+            rows=[],
+            heading_row_color="#2d3748",
+            heading_row_height=40,
+            data_row_min_height=36,
+            visible=False,
+        )
+        
+        # 每日在場人數表格（默认隐藏）
+        self.occupancy_columns = [
+            ft.DataColumn(ft.Text(col_name, color="#ffffff"))
+            for col_name in ["日期", "最高在場人數", "峰值時段", "首次有人", "最後有人"]
+        ]
+        self.occupancy_table = ft.DataTable(
+            columns=self.occupancy_columns,
+            rows=[],
+            heading_row_color="#2d3748",
+            heading_row_height=40,
+            data_row_min_height=36,
+            visible=False,
+        )
+        
         # 创建一个滚动视图来包裹表格
         scrollable_table = ft.ListView(
-            controls=[self.data_table],
+            controls=[self.data_table, self.rollup_table, self.occupancy_table],
             expand=True,
             auto_scroll=False,
         )
@@ -112,7 +197,7 @@ class AccessLogAnalyzer:
                 [
                     ft.Row([title], alignment=ft.MainAxisAlignment.CENTER),
                     ft.Row([select_file_btn, self.export_excel_btn], alignment=ft.MainAxisAlignment.CENTER, height=60, spacing=20),
-                    ft.Row([self.name_filter_label, self.name_filter], alignment=ft.MainAxisAlignment.START, height=40, spacing=10),
+                    ft.Row([self.name_filter_label, self.name_search, self.name_filter, self.granularity_filter_label, self.granularity_filter], alignment=ft.MainAxisAlignment.START, height=40, spacing=10),
                     scrollable_table,
                     ft.Row([self.stats_text], alignment=ft.MainAxisAlignment.START, height=30),
                     ft.Row([self.status], alignment=ft.MainAxisAlignment.START, height=30),
@@ -124,384 +209,278 @@ class AccessLogAnalyzer:
     
     def on_name_selected(self, e):
         """處理名字篩選選擇事件"""
-        selected_value = e.control.value
-        
-        if selected_value == "全部顯示":
-            self.selected_name = None
-            # 顯示所有數據
-            self.display_results(self.all_processed_data)
-            self.status.value = f"顯示全部 {len(self.all_processed_data)} 條記錄"
+        # 與後台分析結果的替換互斥
+        with self.ui_lock:
+            selected_value = e.control.value
+            
+            if self.selected_granularity is not None:
+                # 彙總模式下直接從預先彙總的結果讀取
+                self.selected_name = None if selected_value in ("全部顯示", "全部显示") else selected_value
+                self.display_summary(self.selected_granularity)
+            elif selected_value == "全部顯示":
+                self.selected_name = None
+                # 顯示所有數據
+                self.display_results(self.all_processed_data)
+                self.status.value = f"顯示全部 {len(self.all_processed_data)} 條記錄"
+            else:
+                self.selected_name = selected_value
+                # 根據選中的名字篩選數據，並排除周末無記錄的數據
+                # 保留非周末的所有記錄，以及周末但有記錄（不是"未進公司"狀態）的記錄
+                filtered_data = [
+                    record for record in self.all_processed_data 
+                    if record['emp_name'] == selected_value 
+                    and (not record['is_weekend'] or ('status' in record and '未進公司' not in record['status']))
+                ]
+                self.display_results(filtered_data)
+                self.status.value = f"顯示 {selected_value} 的 {len(filtered_data)} 條記錄"
+            
+            self.status.color = "#4ade80"  # 綠色
+            self.page.update()
+    
+    def on_name_search(self, e):
+        """處理名字搜尋輸入事件，只渲染最匹配的選項"""
+        # 與後台分析結果的替換互斥
+        with self.ui_lock:
+            self.update_name_options(e.control.value)
+            self.page.update()
+    
+    def update_name_options(self, query=""):
+        """根據搜尋字串更新名字篩選下拉菜單的選項"""
+        matches = self.employee_search_index.search(query, limit=self.max_name_options)
+        # 保留目前選中的員工，避免搜尋時選項消失
+        if self.selected_name is not None and self.selected_name not in matches:
+            matches = [self.selected_name] + matches[:self.max_name_options - 1]
+        self.name_filter.options = [ft.dropdown.Option("全部顯示")] + [
+            ft.dropdown.Option(key=name, text=self.employee_search_index.display_text(name))
+            for name in matches
+        ]
+    
+    def on_granularity_selected(self, e):
+        """處理彙總粒度選擇事件"""
+        # 與後台分析結果的替換互斥
+        with self.ui_lock:
+            granularity_map = {"明細": None, "按週彙總": "week", "按月彙總": "month", "在場人數": "occupancy"}
+            self.selected_granularity = granularity_map.get(e.control.value)
+            
+            if self.selected_granularity is None:
+                self.rollup_table.visible = False
+                self.occupancy_table.visible = False
+                self.data_table.visible = True
+                if self.selected_name is None:
+                    self.display_results(self.all_processed_data)
+                    self.status.value = f"顯示全部 {len(self.all_processed_data)} 條記錄"
+                else:
+                    filtered_data = [
+                        record for record in self.all_processed_data
+                        if record['emp_name'] == self.selected_name
+                        and (not record['is_weekend'] or ('status' in record and '未進公司' not in record['status']))
+                    ]
+                    self.display_results(filtered_data)
+                    self.status.value = f"顯示 {self.selected_name} 的 {len(filtered_data)} 條記錄"
+            else:
+                self.display_summary(self.selected_granularity)
+            
+            self.status.color = "#4ade80"  # 綠色
+            self.page.update()
+    
+    def display_summary(self, granularity):
+        """根據選中的彙總方式顯示週/月彙總或在場人數"""
+        if granularity == "occupancy":
+            self.display_occupancy()
         else:
-            self.selected_name = selected_value
-            # 根據選中的名字篩選數據，並排除周末無記錄的數據
-            # 保留非周末的所有記錄，以及周末但有記錄（不是"未進公司"狀態）的記錄
-            filtered_data = [
-                record for record in self.all_processed_data 
-                if record['emp_name'] == selected_value 
-                and (not record['is_weekend'] or ('status' in record and '未進公司' not in record['status']))
-            ]
-            self.display_results(filtered_data)
-            self.status.value = f"顯示 {selected_value} 的 {len(filtered_data)} 條記錄"
-        
-        self.status.color = "#4ade80"  # 綠色
-        self.page.update()
+            self.display_rollup(granularity)
+    
+    def display_occupancy(self):
+        """顯示每日最高在場人數（全體人員，不受名字篩選影響）"""
+        daily = self.occupancy.daily_peaks()
+        
+        self.occupancy_table.rows.clear()
+        for row in daily.itertuples(index=False):
+            weekday = datetime.strptime(row.date, '%Y-%m-%d').weekday()
+            row_color = ft.Colors.with_opacity(0.3, ft.Colors.AMBER_700) if weekday in [5, 6] else None
+            self.occupancy_table.rows.append(
+                ft.DataRow(
+                    color=row_color,
+                    cells=[
+                        ft.DataCell(ft.Text(row.date, color=ft.Colors.WHITE)),
+                        ft.DataCell(ft.Text(str(row.peak_occupancy), color=ft.Colors.WHITE)),
+                        ft.DataCell(ft.Text(row.peak_slot, color=ft.Colors.WHITE)),
+                        ft.DataCell(ft.Text(row.first_occupied, color=ft.Colors.WHITE)),
+                        ft.DataCell(ft.Text(row.last_occupied, color=ft.Colors.WHITE)),
+                    ]
+                )
+            )
+        
+        self.data_table.visible = False
+        self.rollup_table.visible = False
+        self.occupancy_table.visible = True
+        
+        peak = int(daily['peak_occupancy'].max()) if len(daily) else 0
+        self.stats_text.value = f"統計信息(在場人數): {len(daily)} 天, 每{self.occupancy.slot_minutes}分鐘時段最高在場 {peak} 人"
+        self.stats_text.color = "#4ade80"  # 綠色
+        self.status.value = f"顯示每日在場人數，共 {len(daily)} 天"
+    
+    def display_rollup(self, granularity):
+        """從預先彙總的結果中讀取並顯示週/月彙總"""
+        summary = self.rollup.summary(granularity, self.selected_name)
+        
+        self.rollup_table.rows.clear()
+        for row in summary.itertuples(index=False):
+            text_color = ft.Colors.RED if row.late_days or row.absent_days else ft.Colors.WHITE
+            self.rollup_table.rows.append(
+                ft.DataRow(
+                    cells=[
+                        ft.DataCell(ft.Text(row.period, color=ft.Colors.WHITE)),
+                        ft.DataCell(ft.Text(row.emp_name, color=ft.Colors.WHITE)),
+                        ft.DataCell(ft.Text(str(row.late_days), color=text_color)),
+                        ft.DataCell(ft.Text(str(row.early_leave_days), color=ft.Colors.WHITE)),
+                        ft.DataCell(ft.Text(str(row.absent_days), color=text_color)),
+                        ft.DataCell(ft.Text(str(row.out_days), color=ft.Colors.WHITE)),
+                        ft.DataCell(ft.Text(str(row.late_minutes), color=ft.Colors.WHITE)),
+                        ft.DataCell(ft.Text(f"{row.worked_hours:.2f}", color=ft.Colors.WHITE)),
+                    ]
+                )
+            )
+        
+        self.data_table.visible = False
+        self.occupancy_table.visible = False
+        self.rollup_table.visible = True
+        
+        # 統計信息同樣讀取彙總結果，無需重新掃描記錄
+        totals = summary[self.rollup.count_columns].sum()
+        granularity_label = "週" if granularity == "week" else "月"
+        self.stats_text.value = (
+            f"統計信息({granularity_label}彙總): {len(summary)} 個期間, 遲到 {int(totals['late_days'])}, "
+            f"早退 {int(totals['early_leave_days'])}, 未進公司 {int(totals['absent_days'])}, "
+            f"外出 {int(totals['out_days'])}, 遲到分鐘 {int(totals['late_minutes'])}, 工作時數 {totals['worked_hours']:.2f}"
+        )
+        self.stats_text.color = "#4ade80"  # 綠色
+        self.status.value = f"顯示{granularity_label}彙總，共 {len(summary)} 條"
     
     def on_file_selected(self, e):
         if e.files:
-            file_path = e.files[0].path
-            try:
+            file_paths = [f.path for f in e.files]
+            with self.ui_lock:
+                # 每次选择文件递增，后台分析完成时用于丢弃过期的结果
+                self.load_generation += 1
+                generation = self.load_generation
+                
                 # 顯示加載中狀態
-                self.status.value = "正在載入和分析數據..."
+                self.status.value = "正在載入預覽..."
                 self.status.color = "#cccccc"
+                self.export_excel_btn.disabled = True
+                self.showing_preview = True
                 self.page.update()
-                
-                if self.debug_mode:
+            
+            if self.debug_mode:
+                for file_path in file_paths:
                     print(f"\n===== DEBUG: 选择的文件路径: {file_path}")
                     print(f"DEBUG: 文件是否存在: {os.path.exists(file_path)}")
                     print(f"DEBUG: 文件大小: {os.path.getsize(file_path)} 字节")
+            
+            # 先解析第一个文件的前几行，立即显示预览和检测到的文件信息
+            try:
+                self.show_preview(file_paths[0], generation)
+            except Exception as ex:
+                # 预览失败不影响完整分析
+                print(f"预览失败: {str(ex)}")
+            
+            # 完整分析在后台执行，完成后替换预览
+            threading.Thread(target=self.run_full_analysis, args=(file_paths, generation), daemon=True).start()
+    
+    def show_preview(self, file_path, generation):
+        """读取文件前preview_rows行并显示预览结果"""
+        # 使用独立的处理器，避免与后台完整分析共享状态
+        preview_processor = AccessLogProcessor(debug_mode=self.debug_mode, dedup_window_seconds=30)
+        data = preview_processor.load_preview(file_path, nrows=self.preview_rows)
+        processed_data = preview_processor.process_data(data)
+        
+        with self.ui_lock:
+            # 完整分析已经完成或又选择了其他文件时，不再显示预览
+            if generation != self.load_generation or not self.showing_preview:
+                return
+            self.apply_results(processed_data, data, preview_processor.id_name_map, is_preview=True)
+            
+            info = preview_processor.last_load_info
+            self.status.value = (
+                f"預覽: 前 {info['rows']} 行, 編碼 {info['encoding']}, "
+                f"日期格式 {info.get('datetime_format') or '未知'}, 欄位 {'、'.join(map(str, info['columns']))}"
+                f" —— 正在後台分析完整數據..."
+            )
+            self.status.color = "#facc15"  # 黃色
+            self.page.update()
+    
+    def run_full_analysis(self, file_paths, generation):
+        """在后台线程中加载并处理全部数据，完成后替换预览"""
+        try:
+            with self.analysis_lock:
+                # 排队期间已经选择了其他文件，不再分析
+                if generation != self.load_generation:
+                    return
                 
                 # 加载并处理数据
-                data = self.load_data(file_path)
-                processed_data = self.process_data(data)
-                
-                # 保存所有处理后的数据
-                self.all_processed_data = processed_data
-                
-                # 更新名字筛选下拉菜单选项
-                self.employee_names = sorted(list(set([record['emp_name'] for record in processed_data])))
-                self.name_filter.options = [ft.dropdown.Option("全部显示")] + [ft.dropdown.Option(name) for name in self.employee_names]
-                self.name_filter.value = "全部显示"
-                self.selected_name = None
-                
-                # 启用导出Excel按钮
-                self.export_excel_btn.disabled = False
+                data = self.processor.load_files(file_paths)
+                processed_data = self.processor.process_data(data)
+                id_name_map = dict(self.processor.id_name_map)
+            
+            with self.ui_lock:
+                # 已经选择了其他文件，丢弃本次结果（在锁内检查，避免与新的选择交错）
+                if generation != self.load_generation:
+                    return
                 
-                # 显示结果
-                self.display_results(processed_data)
+                self.apply_results(processed_data, data, id_name_map, is_preview=False)
                 
                 # 更新狀態
                 self.status.value = f"分析完成，共 {len(processed_data)} 條記錄"
                 self.status.color = "#4ade80"  # 綠色
                 self.page.update()
-                
-            except Exception as ex:
+            
+        except Exception as ex:
+            with self.ui_lock:
+                if generation != self.load_generation:
+                    return
                 self.status.value = f"分析出錯: {str(ex)}"
                 self.status.color = "#ef4444"  # 紅色
                 self.page.update()
-                if self.debug_mode:
-                    import traceback
-                    print(f"\n===== DEBUG: 分析过程异常 ====")
-                    traceback.print_exc()
+            if self.debug_mode:
+                import traceback
+                print(f"\n===== DEBUG: 分析过程异常 ====")
+                traceback.print_exc()
     
-    def load_data(self, file_path):
-        # 读取CSV文件，处理列数不一致的问题
-        print(f"开始读取文件: {file_path}")
-        
-        # 尝试不同的编码读取文件
-        encodings = ['utf-8', 'gbk', 'latin1']
-        df = None
-        
-        # 正确的列名（根据CSV文件表头）
-        expected_columns = ['序號', '記錄時間', '編號', '姓名', '允許通行', '詳細資訊']
-        
-        for encoding in encodings:
-            try:
-                # 首先读取前几行来检查列数
-                with open(file_path, 'r', encoding=encoding) as f:
-                    header_line = f.readline().strip()
-                    first_data_line = f.readline().strip()
-                    
-                    # 检查列数
-                    header_cols = header_line.split(',')
-                    data_cols = first_data_line.split(',')
-                    
-                    print(f"使用{encoding}编码读取的列信息: 表头{len(header_cols)}列, 数据{len(data_cols)}列")
-                    
-                    # 处理列数不一致的情况
-                    if len(data_cols) > len(header_cols):
-                        # 为额外的列创建临时名称
-                        additional_cols = [f'临时列{i}' for i in range(len(data_cols) - len(header_cols))]
-                        actual_columns = header_cols + additional_cols
-                        print(f"处理列数不一致: 添加了{len(additional_cols)}个临时列")
-                    else:
-                        actual_columns = header_cols[:len(data_cols)]
-                        print(f"处理列数不一致: 只使用前{len(actual_columns)}个表头列")
-                
-                # 重新读取整个文件，指定正确的列名
-                df = pd.read_csv(
-                    file_path, 
-                    encoding=encoding, 
-                    header=0,  # 使用第一行作为表头
-                    names=actual_columns,  # 指定实际列名
-                    on_bad_lines='skip'  # 跳过格式错误的行
-                )
-                
-                print(f"成功使用{encoding}编码读取文件，形状: {df.shape}")
-                break
-            except Exception as e:
-                print(f"使用{encoding}编码读取失败: {str(e)}")
-        
-        if df is None:
-            raise Exception("无法读取CSV文件，尝试了多种编码")
-        
-        # 显示前几行数据用于调试
-        print("文件前5行数据:")
-        print(df.head())
-        
-        if self.debug_mode:
-            print(f"\n===== DEBUG: 列信息 ====")
-            print(f"所有列名: {list(df.columns)}")
-            print(f"列数据类型:\n{df.dtypes}")
-        
-        # 检查是否包含必需的列
-        required_columns = ['記錄時間', '編號', '姓名']
-        for col in required_columns:
-            if col not in df.columns:
-                raise Exception(f"CSV文件中未找到必需的列: {col}")
-        
-        # 创建编号与姓名的映射
-        # 确保只使用有效的编号和姓名对
-        valid_pairs = df[df['編號'].notna() & df['姓名'].notna() & (df['姓名'] != '是')]
-        self.id_name_map = dict(zip(valid_pairs['編號'], valid_pairs['姓名']))
-        print(f"创建了编号-姓名映射，共{len(self.id_name_map)}个条目")
-        
-        if self.debug_mode:
-            print(f"\n===== DEBUG: 编号-姓名映射前5条 ====")
-            for i, (emp_id, name) in enumerate(list(self.id_name_map.items())[:5]):
-                print(f"{emp_id}: {name}")
-        
-        # 日期时间解析 - 尝试多种格式
-        print("开始解析日期时间...")
-        datetime_formats = [
-            '%Y-%m-%d %H:%M:%S',  # 标准格式
-            '%Y/%m/%d %H:%M:%S',
-            '%Y-%m-%d %H:%M',
-            '%Y/%m/%d %H:%M',
-            '%d-%m-%Y %H:%M:%S',
-            '%d/%m/%Y %H:%M:%S',
-        ]
-        
-        # 初始化datetime列为空
-        df['datetime'] = pd.NaT
-        
-        for fmt in datetime_formats:
-            try:
-                # 保存当前的有效解析结果
-                previous_valid = df['datetime'].notna().sum()
-                
-                # 使用pd.to_datetime并指定format
-                temp_datetime = pd.to_datetime(df['記錄時間'], format=fmt, errors='coerce')
-                
-                # 更新datetime列，但只保留新的有效解析结果
-                df.loc[temp_datetime.notna(), 'datetime'] = temp_datetime[temp_datetime.notna()]
-                
-                # 计算解析成功率
-                success_rate = df['datetime'].notna().sum() / len(df)
-                new_valid = df['datetime'].notna().sum() - previous_valid
-                print(f"尝试格式'{fmt}'，新增有效: {new_valid}, 总成功率: {success_rate:.2%} ({df['datetime'].notna().sum()}/{len(df)})")
-                
-                # 如果所有记录都已成功解析，提前退出
-                if df['datetime'].notna().all():
-                    print("所有记录均已成功解析，停止尝试其他格式")
-                    break
-            except Exception as e:
-                print(f"尝试格式'{fmt}'时出错: {str(e)}")
-        
-        # 如果还有未解析的记录，尝试自动解析
-        if not df['datetime'].notna().all():
-            print("仍有未解析的记录，尝试自动解析...")
-            # 保存当前的有效解析结果
-            previous_valid = df['datetime'].notna().sum()
-            
-            # 尝试自动解析剩余的记录
-            temp_datetime = pd.to_datetime(df.loc[df['datetime'].isna(), '記錄時間'], errors='coerce')
-            df.loc[temp_datetime.notna().index, 'datetime'] = temp_datetime
-            
-            new_valid = df['datetime'].notna().sum() - previous_valid
-            success_rate = df['datetime'].notna().sum() / len(df)
-            print(f"自动解析新增有效: {new_valid}, 最终成功率: {success_rate:.2%} ({df['datetime'].notna().sum()}/{len(df)})")
-        
-        # 统计解析结果
-        valid_count = df['datetime'].notna().sum()
-        total_count = len(df)
-        print(f"最终日期时间解析结果: 有效 {valid_count}/{total_count}")
-        
-        if self.debug_mode:
-            print(f"\n===== DEBUG: 日期时间解析样本 ====")
-            # 显示前5个解析成功的记录
-            valid_samples = df[df['datetime'].notna()].head()
-            if not valid_samples.empty:
-                for i, row in valid_samples.iterrows():
-                    print(f"原始值: {row['記錄時間']} -> 解析后: {row['datetime']}")
-            
-            # 显示前5个解析失败的记录（如果有）
-            invalid_samples = df[df['datetime'].isna()].head()
-            if not invalid_samples.empty:
-                print(f"\n解析失败的样本:")
-                for i, row in invalid_samples.iterrows():
-                    print(f"原始值: {row['記錄時間']}")
-        
-        # 如果没有有效数据，抛出异常
-        if valid_count == 0:
-            # 显示前几个日期时间值用于调试
-            if total_count > 0:
-                sample_datetimes = df['記錄時間'].head().tolist()
-                print(f"日期时间样本值: {sample_datetimes}")
-            raise Exception("没有有效的日期时间数据")
-        
-        # 过滤掉无效的日期时间记录
-        df = df.dropna(subset=['datetime'])
-        
-        # 添加日期列，用于分组
-        df['date'] = df['datetime'].dt.date
-        
-        if self.debug_mode:
-            print(f"\n===== DEBUG: 过滤后的数据信息 ====")
-            print(f"过滤后的数据形状: {df.shape}")
-            print(f"日期范围: {df['date'].min()} 至 {df['date'].max()}")
-            print(f"唯一日期数量: {df['date'].nunique()}")
-            print(f"唯一编号数量: {df['編號'].nunique()}")
-        
-        return df
+    def apply_results(self, processed_data, data, id_name_map, is_preview):
+        """保存处理结果，重建汇总与搜索索引，并重置筛选后显示（调用时需持有ui_lock）
+        
+        汇总与索引都建立新对象后再替换，进行中的导出持有的旧对象不会被修改
+        """
+        # 保存所有处理后的数据
+        self.all_processed_data = processed_data
+        self.showing_preview = is_preview
+        
+        # 一次性建立週/月汇总及在场人数，供界面和导出直接读取
+        self.rollup = AttendanceRollup().build(processed_data)
+        occupancy = OccupancyAnalyzer(slot_minutes=self.occupancy.slot_minutes, mode=self.occupancy.mode)
+        occupancy.build(data, id_name_map)
+        self.occupancy = occupancy
+        
+        # 更新名字筛选下拉菜单选项
+        self.employee_names = sorted(list(set([record['emp_name'] for record in processed_data])))
+        self.employee_search_index = EmployeeSearchIndex().build(self.employee_names, id_name_map)
+        self.selected_name = None
+        self.name_search.value = ""
+        self.update_name_options()
+        self.name_filter.value = "全部顯示"
+        self.granularity_filter.value = "明細"
+        self.selected_granularity = None
+        self.rollup_table.visible = False
+        self.occupancy_table.visible = False
+        self.data_table.visible = True
+        
+        # 完整分析完成后才启用导出Excel按钮
+        self.export_excel_btn.disabled = is_preview
+        
+        # 显示结果
+        self.display_results(processed_data)
     
-    def process_data(self, data):
-        print("开始处理数据...")
-        results = []
-        
-        # 获取日期范围
-        min_date = data['date'].min()
-        max_date = data['date'].max()
-        
-        # 创建日期范围
-        date_range = pd.date_range(start=min_date, end=max_date, freq='D').date.tolist()
-        
-        # 按日期和编号分组
-        grouped = data.groupby(['date', '編號'])
-        
-        # 标准上班和下班时间
-        standard_check_in = time(9, 0)
-        standard_check_out = time(18, 0)
-        
-        if self.debug_mode:
-            print(f"\n===== DEBUG: 分组处理详情 ====")
-            print(f"总组数: {len(grouped)}")
-        
-        group_count = 0
-        for (date, emp_id), group in grouped:
-            group_count += 1
-            
-            if self.debug_mode and group_count <= 3:  # 只显示前3组的详情
-                print(f"\n组 {group_count}: 日期={date}, 编号={emp_id}, 记录数={len(group)}")
-                print(f"该组原始记录:\n{group[['datetime', '編號', '姓名']].to_string(index=False)}")
-            
-            # 按时间排序
-            sorted_group = group.sort_values('datetime')
-            
-            # 获取最早的记录作为上班时间，最晚的记录作为下班时间
-            check_in_time = sorted_group.iloc[0]['datetime'].time()
-            check_out_time = sorted_group.iloc[-1]['datetime'].time()
-            
-            # 获取员工姓名
-            emp_name = self.id_name_map.get(emp_id, str(emp_id))
-            
-            # 计算星期几
-            weekday_map = {0: '周一', 1: '周二', 2: '周三', 3: '周四', 4: '周五', 5: '周六', 6: '周日'}
-            weekday = weekday_map[date.weekday()]
-            is_weekend = date.weekday() in [5, 6]  # 周六或周日
-            
-            # 判斷狀態：1筆記錄標記為外出
-            if len(group) == 1:
-                status_text = "外出"
-            else:
-                # 判斷是否遲到或早退
-                status = []
-                if check_in_time > standard_check_in:
-                    status.append("遲到")
-                if check_out_time < standard_check_out:
-                    status.append("早退")
-                
-                # 如果是周末，添加假日標記
-                if is_weekend:
-                    status.append("假日")
-
-                status_text = "、".join(status) if status else "正常"
-            
-            # 格式化日期显示
-            formatted_date = date.strftime('%Y-%m-%d')
-            
-            if self.debug_mode and group_count <= 3:
-                print(f"上班时间: {check_in_time} (标准: {standard_check_in}) -> {'迟到' if check_in_time > standard_check_in else '正常'}")
-                print(f"下班时间: {check_out_time} (标准: {standard_check_out}) -> {'早退' if check_out_time < standard_check_out else '正常'}")
-                print(f"最终状态: {status_text}")
-            
-            # 计算星期几
-            weekday_map = {0: '周一', 1: '周二', 2: '周三', 3: '周四', 4: '周五', 5: '周六', 6: '周日'}
-            weekday = weekday_map[date.weekday()]
-            is_weekend = date.weekday() in [5, 6]  # 周六或周日
-            
-            if self.debug_mode and group_count <= 3:
-                print(f"日期 {formatted_date} 是 {weekday}, {'周末' if is_weekend else '工作日'}")
-            
-            # 添加到结果
-            results.append({
-                'date': formatted_date,
-                'weekday': weekday,
-                'is_weekend': is_weekend,
-                'emp_id': emp_id,
-                'emp_name': emp_name,
-                'check_in': check_in_time.strftime('%H:%M'),
-                'check_out': check_out_time.strftime('%H:%M'),
-                'status': status_text
-            })
-        
-        # 收集所有员工和日期的组合
-        all_employee_dates = set()
-        for record in results:
-            all_employee_dates.add((record['date'], record['emp_name']))
-            
-        # 收集所有唯一员工姓名
-        all_employees = set(record['emp_name'] for record in results)
-        
-        # 为每个员工和每一天检查是否有记录，如果没有则添加"未进公司"记录
-        missing_records = []
-        for employee in all_employees:
-            for date in date_range:
-                date_str = date.strftime('%Y-%m-%d')
-                if (date_str, employee) not in all_employee_dates:
-                    # 计算星期几
-                    weekday_map = {0: '周一', 1: '周二', 2: '周三', 3: '周四', 4: '周五', 5: '周六', 6: '周日'}
-                    weekday = weekday_map[date.weekday()]
-                    is_weekend = date.weekday() in [5, 6]  # 周六或周日
-                    
-                    missing_records.append({
-                        'date': date_str,
-                        'weekday': weekday,
-                        'is_weekend': is_weekend,
-                        'emp_id': '',
-                        'emp_name': employee,
-                        'check_in': '-',
-                        'check_out': '-',
-                        'status': '未進公司'
-                    })
-        
-        # 合并结果
-        results.extend(missing_records)
-        
-        # 按日期和姓名排序
-        results.sort(key=lambda x: (x['date'], x['emp_name']))
-        
-        if self.debug_mode:
-            print(f"\n===== DEBUG: 处理结果样本 ====")
-            for i, record in enumerate(results[:5]):
-                print(f"记录 {i+1}: {record}")
-            
-            # 统计未进公司的记录
-            absent_count = sum(1 for record in results if record['status'] == '未进公司')
-            print(f"未进公司记录数: {absent_count}")
-        
-        print(f"数据处理完成，共生成{len(results)}条记录")
-        return results
-        
     def on_export_excel(self, e):
         """处理导出Excel按钮点击事件"""
         if not self.all_processed_data:
@@ -513,15 +492,28 @@ class AccessLogAnalyzer:
         # 打开保存文件对话框
         self.save_file_picker.save_file(
             file_type=ft.FilePickerFileType.CUSTOM,
-            allowed_extensions=["xlsx"],
-            dialog_title="保存Excel文件"
+            allowed_extensions=["xlsx"] + flat_exporter.supported_extensions(),
+            dialog_title="保存Excel或CSV/Parquet/JSON Lines文件"
         )
         
     def on_save_file_selected(self, e):
         """处理保存文件对话框的结果"""
         if e.path:
-            # 确保文件路径包含.xlsx扩展名
             file_path = e.path
+            # 在锁内取得当前结果的快照，导出期间替换结果不影响本次导出
+            with self.ui_lock:
+                if self.showing_preview or not self.all_processed_data:
+                    self.status.value = "完整分析尚未完成，暂不能导出"
+                    self.status.color = "#ef4444"  # 红色
+                    self.page.update()
+                    return
+                snapshot = (self.all_processed_data, self.rollup, self.occupancy)
+            
+            # 平面文件格式（CSV/Parquet/JSON Lines）使用串流导出
+            if os.path.splitext(file_path)[1].lower().lstrip('.') in flat_exporter.supported_extensions():
+                self.export_flat_file(file_path, snapshot)
+                return
+            # 确保文件路径包含.xlsx扩展名
             if not file_path.lower().endswith('.xlsx'):
                 file_path += '.xlsx'
             try:
@@ -531,7 +523,8 @@ class AccessLogAnalyzer:
                 self.page.update()
                 
                 # 导出Excel（使用独立的excel_exporter模块）
-                excel_exporter.export_to_excel(file_path, self.all_processed_data)
+                all_processed_data, rollup, occupancy = snapshot
+                excel_exporter.export_to_excel(file_path, all_processed_data, rollup=rollup, occupancy=occupancy)
                 
                 # 更新状态
                 self.status.value = f"Excel文件已成功导出到: {file_path}"
@@ -547,52 +540,50 @@ class AccessLogAnalyzer:
                     print(f"\n===== DEBUG: 导出Excel异常 ====")
                     traceback.print_exc()
     
+    def export_flat_file(self, file_path, snapshot):
+        """导出为CSV/Parquet/JSON Lines文件，snapshot为(处理结果, 汇总, 在场人数)"""
+        try:
+            self.status.value = "正在导出文件..."
+            self.status.color = "#cccccc"
+            self.page.update()
+            
+            all_processed_data, rollup, occupancy = snapshot
+            written_files = flat_exporter.export(file_path, all_processed_data, rollup=rollup, occupancy=occupancy)
+            
+            self.status.value = f"已成功导出{len(written_files)}个文件到: {os.path.dirname(file_path)}"
+            self.status.color = "#4ade80"  # 绿色
+            self.page.update()
+            
+        except Exception as ex:
+            self.status.value = f"导出文件出错: {str(ex)}"
+            self.status.color = "#ef4444"  # 红色
+            self.page.update()
+            if self.debug_mode:
+                import traceback
+                print(f"\n===== DEBUG: 导出文件异常 ====")
+                traceback.print_exc()
+    
     def calculate_statistics(self, processed_data):
-        """計算並顯示數據統計信息"""
+        """顯示數據統計信息，讀取出勤彙總的每日明細（與匯出的統計資訊使用相同的計數規則）"""
         if not processed_data:
             self.stats_text.value = "統計信息: 無數據"
             return
         
-        # 統計不同狀態的數量
-        status_counts = {}
-        for record in processed_data:
-            status = record['status']
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        # 計算上班和下班時間相關統計
-        check_in_times = []
-        check_out_times = []
-        late_count = 0
-        early_leave_count = 0
-        normal_count = 0
-        
-        for record in processed_data:
-            if record['check_in'] != '-' and ':' in record['check_in']:
-                check_in_time = datetime.strptime(record['check_in'], '%H:%M').time()
-                check_in_times.append(check_in_time)
-                # 檢查是否遲到（9:00以後）
-                if check_in_time > time(9, 0):
-                    late_count += 1
-            
-            if record['check_out'] != '-' and ':' in record['check_out']:
-                check_out_time = datetime.strptime(record['check_out'], '%H:%M').time()
-                check_out_times.append(check_out_time)
-                # 檢查是否早退（18:00以前）
-                if check_out_time < time(18, 0):
-                    early_leave_count += 1
-            
-            if record['status'] == '正常':
-                normal_count += 1
+        if self.selected_name is None:
+            totals = self.rollup.summary('all')[self.rollup.count_columns].sum()
+        else:
+            # 選中員工時只統計該員工，並與明細表一樣排除周末的"未進公司"記錄
+            daily = self.rollup.daily
+            daily = daily[daily['emp_name'] == self.selected_name]
+            weekend_absent = (daily['date'].dt.weekday >= 5) & (daily['absent_days'] > 0)
+            totals = daily.loc[~weekend_absent, self.rollup.count_columns].sum()
         
         # 生成統計文本
-        stats = f"統計信息: 總記錄 {len(processed_data)}, 正常 {normal_count}, 遲到 {late_count}, 早退 {early_leave_count}"
-        
-        # 添加其他狀態統計
-        other_statuses = [f"{status}: {count}" for status, count in status_counts.items() if status not in ['正常', '遲到', '早退']]
-        if other_statuses:
-            stats += f", {', '.join(other_statuses)}"
-        
-        self.stats_text.value = stats
+        self.stats_text.value = (
+            f"統計信息: 總記錄 {int(totals['total_days'])}, 正常 {int(totals['normal_days'])}, "
+            f"遲到 {int(totals['late_days'])}, 早退 {int(totals['early_leave_days'])}, "
+            f"未進公司 {int(totals['absent_days'])}, 外出 {int(totals['out_days'])}, 假日 {int(totals['holiday_days'])}"
+        )
         self.stats_text.color = "#4ade80"  # 綠色
     
     def display_results(self, processed_data):
@@ -671,4 +662,6 @@ def main(page):
 import flet as ft
 
 if __name__ == "__main__":
+    # PyInstaller打包后使用进程池需要先调用freeze_support
+    multiprocessing.freeze_support()
     ft.app(target=main)
\ No newline at end of file
@@ -0,0 +1,477 @@
+import heapq
+import multiprocessing
+import pandas as pd
+from datetime import time
+from concurrent.futures import ProcessPoolExecutor
+from swipe_deduplicator import SwipeDeduplicator
+
+class AccessLogProcessor:
+    def __init__(self, debug_mode=False, dedup_window_seconds=30, csv_engine='pandas', parallel_workers=1, parallel_min_rows=50000):
+        # 用於存儲編號與姓名的映射關係
+        self.id_name_map = {}
+        # 开启debug模式
+        self.debug_mode = debug_mode
+        # 刷卡去重（合併同一编号的连续刷卡）
+        self.swipe_deduplicator = SwipeDeduplicator(window_seconds=dedup_window_seconds)
+        # CSV解析引擎：'pandas'（单线程）、'pyarrow'（多线程、内存映射）或'auto'（已安装pyarrow时使用）
+        self.csv_engine = csv_engine
+        # 并行处理的进程数（1表示单进程），数据行数少于parallel_min_rows时不启用进程池
+        self.parallel_workers = parallel_workers
+        self.parallel_min_rows = parallel_min_rows
+        # 最近一次load_data检测到的文件信息（编码、列名、日期格式、行数）
+        self.last_load_info = {}
+    
+    def load_files(self, file_paths):
+        """加载一个或多个日志文件，合并后去除重复和连续刷卡"""
+        frames = []
+        id_name_map = {}
+        for file_path in file_paths:
+            frames.append(self.load_data(file_path))
+            # load_data会覆盖映射，这里合并所有文件的映射
+            id_name_map.update(self.id_name_map)
+        self.id_name_map = id_name_map
+        
+        data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        
+        # 在分组聚合之前减少行数
+        return self.swipe_deduplicator.deduplicate(data)
+    
+    def load_preview(self, file_path, nrows=1000):
+        """只读取文件前nrows行并去重，用于在完整分析完成前快速显示预览"""
+        return self.swipe_deduplicator.deduplicate(self.load_data(file_path, nrows=nrows))
+    
+    def load_data(self, file_path, nrows=None):
+        # 读取CSV文件，处理列数不一致的问题（nrows不为空时只读取前nrows行）
+        print(f"开始读取文件: {file_path}")
+        
+        # 尝试不同的编码读取文件
+        encodings = ['utf-8', 'gbk', 'latin1']
+        df = None
+        
+        # 正确的列名（根据CSV文件表头）
+        expected_columns = ['序號', '記錄時間', '編號', '姓名', '允許通行', '詳細資訊']
+        
+        for encoding in encodings:
+            try:
+                # 首先读取前几行来检查列数
+                with open(file_path, 'r', encoding=encoding) as f:
+                    header_line = f.readline().strip()
+                    first_data_line = f.readline().strip()
+                    
+                    # 检查列数
+                    header_cols = header_line.split(',')
+                    data_cols = first_data_line.split(',')
+                    
+                    print(f"使用{encoding}编码读取的列信息: 表头{len(header_cols)}列, 数据{len(data_cols)}列")
+                    
+                    # 处理列数不一致的情况
+                    if len(data_cols) > len(header_cols):
+                        # 为额外的列创建临时名称
+                        additional_cols = [f'临时列{i}' for i in range(len(data_cols) - len(header_cols))]
+                        actual_columns = header_cols + additional_cols
+                        print(f"处理列数不一致: 添加了{len(additional_cols)}个临时列")
+                    else:
+                        actual_columns = header_cols[:len(data_cols)]
+                        print(f"处理列数不一致: 只使用前{len(actual_columns)}个表头列")
+                
+                # 重新读取整个文件，指定正确的列名（只读取前几行时pandas更快）
+                if nrows is None and self._use_arrow():
+                    df = self._read_csv_arrow(file_path, encoding, actual_columns)
+                else:
+                    df = pd.read_csv(
+                        file_path, 
+                        encoding=encoding, 
+                        header=0,  # 使用第一行作为表头
+                        names=actual_columns,  # 指定实际列名
+                        on_bad_lines='skip',  # 跳过格式错误的行
+                        nrows=nrows
+                    )
+                
+                print(f"成功使用{encoding}编码读取文件，形状: {df.shape}")
+                self.last_load_info = {
+                    'file_path': file_path,
+                    'encoding': encoding,
+                    'columns': list(df.columns),
+                    'rows': len(df)
+                }
+                break
+            except Exception as e:
+                print(f"使用{encoding}编码读取失败: {str(e)}")
+        
+        if df is None:
+            raise Exception("无法读取CSV文件，尝试了多种编码")
+        
+        # 显示前几行数据用于调试
+        print("文件前5行数据:")
+        print(df.head())
+        
+        if self.debug_mode:
+            print(f"\n===== DEBUG: 列信息 ====")
+            print(f"所有列名: {list(df.columns)}")
+            print(f"列数据类型:\n{df.dtypes}")
+        
+        # 检查是否包含必需的列
+        required_columns = ['記錄時間', '編號', '姓名']
+        for col in required_columns:
+            if col not in df.columns:
+                raise Exception(f"CSV文件中未找到必需的列: {col}")
+        
+        # 创建编号与姓名的映射
+        # 确保只使用有效的编号和姓名对
+        valid_pairs = df[df['編號'].notna() & df['姓名'].notna() & (df['姓名'] != '是')]
+        self.id_name_map = dict(zip(valid_pairs['編號'], valid_pairs['姓名']))
+        print(f"创建了编号-姓名映射，共{len(self.id_name_map)}个条目")
+        
+        if self.debug_mode:
+            print(f"\n===== DEBUG: 编号-姓名映射前5条 ====")
+            for i, (emp_id, name) in enumerate(list(self.id_name_map.items())[:5]):
+                print(f"{emp_id}: {name}")
+        
+        # 日期时间解析 - 尝试多种格式
+        print("开始解析日期时间...")
+        datetime_formats = [
+            '%Y-%m-%d %H:%M:%S',  # 标准格式
+            '%Y/%m/%d %H:%M:%S',
+            '%Y-%m-%d %H:%M',
+            '%Y/%m/%d %H:%M',
+            '%d-%m-%Y %H:%M:%S',
+            '%d/%m/%Y %H:%M:%S',
+        ]
+        
+        # 初始化datetime列为空
+        df['datetime'] = pd.NaT
+        # 记录每种格式新增的有效解析数，用于判断文件的日期格式
+        format_counts = {}
+        
+        for fmt in datetime_formats:
+            try:
+                # 保存当前的有效解析结果
+                previous_valid = df['datetime'].notna().sum()
+                
+                # 使用pd.to_datetime并指定format
+                temp_datetime = pd.to_datetime(df['記錄時間'], format=fmt, errors='coerce')
+                
+                # 更新datetime列，但只保留新的有效解析结果
+                df.loc[temp_datetime.notna(), 'datetime'] = temp_datetime[temp_datetime.notna()]
+                
+                # 计算解析成功率
+                success_rate = df['datetime'].notna().sum() / len(df)
+                new_valid = df['datetime'].notna().sum() - previous_valid
+                format_counts[fmt] = new_valid
+                print(f"尝试格式'{fmt}'，新增有效: {new_valid}, 总成功率: {success_rate:.2%} ({df['datetime'].notna().sum()}/{len(df)})")
+                
+                # 如果所有记录都已成功解析，提前退出
+                if df['datetime'].notna().all():
+                    print("所有记录均已成功解析，停止尝试其他格式")
+                    break
+            except Exception as e:
+                print(f"尝试格式'{fmt}'时出错: {str(e)}")
+        
+        # 如果还有未解析的记录，尝试自动解析
+        if not df['datetime'].notna().all():
+            print("仍有未解析的记录，尝试自动解析...")
+            # 保存当前的有效解析结果
+            previous_valid = df['datetime'].notna().sum()
+            
+            # 尝试自动解析剩余的记录
+            temp_datetime = pd.to_datetime(df.loc[df['datetime'].isna(), '記錄時間'], errors='coerce')
+            df.loc[temp_datetime.notna().index, 'datetime'] = temp_datetime
+            
+            new_valid = df['datetime'].notna().sum() - previous_valid
+            format_counts['自动解析'] = new_valid
+            success_rate = df['datetime'].notna().sum() / len(df)
+            print(f"自动解析新增有效: {new_valid}, 最终成功率: {success_rate:.2%} ({df['datetime'].notna().sum()}/{len(df)})")
+        
+        # 统计解析结果
+        valid_count = df['datetime'].notna().sum()
+        total_count = len(df)
+        print(f"最终日期时间解析结果: 有效 {valid_count}/{total_count}")
+        
+        # 解析成功最多的格式即为文件的主要日期格式
+        detected_format = max(format_counts, key=format_counts.get) if format_counts else None
+        self.last_load_info['datetime_format'] = detected_format if detected_format and format_counts[detected_format] > 0 else None
+        
+        if self.debug_mode:
+            print(f"\n===== DEBUG: 日期时间解析样本 ====")
+            # 显示前5个解析成功的记录
+            valid_samples = df[df['datetime'].notna()].head()
+            if not valid_samples.empty:
+                for i, row in valid_samples.iterrows():
+                    print(f"原始值: {row['記錄時間']} -> 解析后: {row['datetime']}")
+            
+            # 显示前5个解析失败的记录（如果有）
+            invalid_samples = df[df['datetime'].isna()].head()
+            if not invalid_samples.empty:
+                print(f"\n解析失败的样本:")
+                for i, row in invalid_samples.iterrows():
+                    print(f"原始值: {row['記錄時間']}")
+        
+        # 如果没有有效数据，抛出异常
+        if valid_count == 0:
+            # 显示前几个日期时间值用于调试
+            if total_count > 0:
+                sample_datetimes = df['記錄時間'].head().tolist()
+                print(f"日期时间样本值: {sample_datetimes}")
+            raise Exception("没有有效的日期时间数据")
+        
+        # 过滤掉无效的日期时间记录
+        df = df.dropna(subset=['datetime'])
+        
+        # 添加日期列，用于分组
+        df['date'] = df['datetime'].dt.date
+        
+        if self.debug_mode:
+            print(f"\n===== DEBUG: 过滤后的数据信息 ====")
+            print(f"过滤后的数据形状: {df.shape}")
+            print(f"日期范围: {df['date'].min()} 至 {df['date'].max()}")
+            print(f"唯一日期数量: {df['date'].nunique()}")
+            print(f"唯一编号数量: {df['編號'].nunique()}")
+        
+        return df
+    
+    def _use_arrow(self):
+        """判断是否使用pyarrow解析CSV"""
+        if self.csv_engine == 'pandas':
+            return False
+        try:
+            import pyarrow.csv
+            return True
+        except ImportError:
+            if self.csv_engine == 'pyarrow':
+                raise Exception("使用pyarrow解析CSV需要安装pyarrow: pip install pyarrow")
+            return False
+    
+    def _read_csv_arrow(self, file_path, encoding, actual_columns):
+        """使用pyarrow多线程解析CSV，返回与pandas引擎列类型一致的DataFrame
+        
+        与pandas的on_bad_lines='skip'一致：列数多于actual_columns的行被跳过，
+        列数较少的行补齐分隔符后再用同一schema解析，缺失字段为空值
+        """
+        import io
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        
+        short_rows = []
+        
+        def handle_invalid_row(row):
+            if row.actual_columns < row.expected_columns:
+                # 在行尾补齐缺少的分隔符，之后由pyarrow解析为空值
+                short_rows.append(row.text + ',' * (row.expected_columns - row.actual_columns))
+            return 'skip'
+        
+        read_options = pa_csv.ReadOptions(
+            column_names=actual_columns,
+            skip_rows=1,  # 跳过表头行
+            encoding=encoding,
+            use_threads=True
+        )
+        parse_options = pa_csv.ParseOptions(invalid_row_handler=handle_invalid_row)
+        # 记录时间保持为字符串，后续按多种格式解析；空字符串视为空值（与pandas一致）
+        convert_options = pa_csv.ConvertOptions(
+            column_types={'記錄時間': pa.string()},
+            strings_can_be_null=True
+        )
+        
+        with pa.memory_map(file_path, 'r') as source:
+            table = pa_csv.read_csv(
+                source,
+                read_options=read_options,
+                parse_options=parse_options,
+                convert_options=convert_options
+            )
+        
+        if short_rows:
+            # 补齐后的行按主表的schema严格解析（row.text已转为utf-8文本）
+            short_table = pa_csv.read_csv(
+                io.BytesIO('\n'.join(short_rows).encode('utf-8')),
+                read_options=pa_csv.ReadOptions(column_names=actual_columns),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=dict(zip(table.schema.names, table.schema.types)),
+                    strings_can_be_null=True
+                )
+            )
+            table = pa.concat_tables([table, short_table])
+            print(f"补齐了{len(short_rows)}行列数不足的记录")
+        
+        # 转换为与pandas引擎相同的列类型（含空值的整数列为float64），
+        # Arrow-backed的列在后续逐组处理时明显更慢
+        return table.to_pandas()
+    
+    def process_data(self, data, date_range=None):
+        if self.parallel_workers > 1 and len(data) >= self.parallel_min_rows:
+            return self._process_data_parallel(data)
+        
+        print("开始处理数据...")
+        results = []
+        
+        # 创建日期范围（并行处理时由主进程传入全局日期范围）
+        if date_range is None:
+            date_range = self._get_date_range(data)
+        
+        # 按日期和编号分组
+        grouped = data.groupby(['date', '編號'])
+        
+        # 标准上班和下班时间
+        standard_check_in = time(9, 0)
+        standard_check_out = time(18, 0)
+        
+        if self.debug_mode:
+            print(f"\n===== DEBUG: 分组处理详情 ====")
+            print(f"总组数: {len(grouped)}")
+        
+        group_count = 0
+        for (date, emp_id), group in grouped:
+            group_count += 1
+            
+            if self.debug_mode and group_count <= 3:  # 只显示前3组的详情
+                print(f"\n组 {group_count}: 日期={date}, 编号={emp_id}, 记录数={len(group)}")
+                print(f"该组原始记录:\n{group[['datetime', '編號', '姓名']].to_string(index=False)}")
+            
+            # 按时间排序
+            sorted_group = group.sort_values('datetime')
+            
+            # 获取最早的记录作为上班时间，最晚的记录作为下班时间
+            # （先取列再取值，避免按行取值时跨多种列类型构建Series）
+            check_in_time = sorted_group['datetime'].iloc[0].time()
+            check_out_time = sorted_group['datetime'].iloc[-1].time()
+            
+            # 获取员工姓名
+            emp_name = self.id_name_map.get(emp_id, str(emp_id))
+            
+            # 计算星期几
+            weekday_map = {0: '周一', 1: '周二', 2: '周三', 3: '周四', 4: '周五', 5: '周六', 6: '周日'}
+            weekday = weekday_map[date.weekday()]
+            is_weekend = date.weekday() in [5, 6]  # 周六或周日
+            
+            # 判斷狀態：1筆記錄標記為外出
+            if len(group) == 1:
+                status_text = "外出"
+            else:
+                # 判斷是否遲到或早退
+                status = []
+                if check_in_time > standard_check_in:
+                    status.append("遲到")
+                if check_out_time < standard_check_out:
+                    status.append("早退")
+                
+                # 如果是周末，添加假日標記
+                if is_weekend:
+                    status.append("假日")
+
+                status_text = "、".join(status) if status else "正常"
+            
+            # 格式化日期显示
+            formatted_date = date.strftime('%Y-%m-%d')
+            
+            if self.debug_mode and group_count <= 3:
+                print(f"上班时间: {check_in_time} (标准: {standard_check_in}) -> {'迟到' if check_in_time > standard_check_in else '正常'}")
+                print(f"下班时间: {check_out_time} (标准: {standard_check_out}) -> {'早退' if check_out_time < standard_check_out else '正常'}")
+                print(f"最终状态: {status_text}")
+            
+            # 计算星期几
+            weekday_map = {0: '周一', 1: '周二', 2: '周三', 3: '周四', 4: '周五', 5: '周六', 6: '周日'}
+            weekday = weekday_map[date.weekday()]
+            is_weekend = date.weekday() in [5, 6]  # 周六或周日
+            
+            if self.debug_mode and group_count <= 3:
+                print(f"日期 {formatted_date} 是 {weekday}, {'周末' if is_weekend else '工作日'}")
+            
+            # 添加到结果
+            results.append({
+                'date': formatted_date,
+                'weekday': weekday,
+                'is_weekend': is_weekend,
+                'emp_id': emp_id,
+                'emp_name': emp_name,
+                'check_in': check_in_time.strftime('%H:%M'),
+                'check_out': check_out_time.strftime('%H:%M'),
+                'status': status_text
+            })
+        
+        # 收集所有员工和日期的组合
+        all_employee_dates = set()
+        for record in results:
+            all_employee_dates.add((record['date'], record['emp_name']))
+            
+        # 收集所有唯一员工姓名
+        all_employees = set(record['emp_name'] for record in results)
+        
+        # 为每个员工和每一天检查是否有记录，如果没有则添加"未进公司"记录
+        missing_records = []
+        for employee in all_employees:
+            for date in date_range:
+                date_str = date.strftime('%Y-%m-%d')
+                if (date_str, employee) not in all_employee_dates:
+                    # 计算星期几
+                    weekday_map = {0: '周一', 1: '周二', 2: '周三', 3: '周四', 4: '周五', 5: '周六', 6: '周日'}
+                    weekday = weekday_map[date.weekday()]
+                    is_weekend = date.weekday() in [5, 6]  # 周六或周日
+                    
+                    missing_records.append({
+                        'date': date_str,
+                        'weekday': weekday,
+                        'is_weekend': is_weekend,
+                        'emp_id': '',
+                        'emp_name': employee,
+                        'check_in': '-',
+                        'check_out': '-',
+                        'status': '未進公司'
+                    })
+        
+        # 合并结果
+        results.extend(missing_records)
+        
+        # 按日期和姓名排序
+        results.sort(key=lambda x: (x['date'], x['emp_name']))
+        
+        if self.debug_mode:
+            print(f"\n===== DEBUG: 处理结果样本 ====")
+            for i, record in enumerate(results[:5]):
+                print(f"记录 {i+1}: {record}")
+            
+            # 统计未进公司的记录
+            absent_count = sum(1 for record in results if record['status'] == '未进公司')
+            print(f"未进公司记录数: {absent_count}")
+        
+        print(f"数据处理完成，共生成{len(results)}条记录")
+        return results
+    
+    def _get_date_range(self, data):
+        """获取数据覆盖的完整日期列表"""
+        min_date = data['date'].min()
+        max_date = data['date'].max()
+        return pd.date_range(start=min_date, end=max_date, freq='D').date.tolist()
+    
+    def _process_data_parallel(self, data):
+        """按员工划分数据，使用进程池并行处理后按(日期, 姓名)确定性合并
+        
+        补充"未进公司"记录是按姓名进行的，因此按编号对应的姓名划分，
+        保证同名的多个编号落在同一分区，结果与单进程处理一致
+        """
+        date_range = self._get_date_range(data)
+        
+        # 按员工姓名的稳定哈希值分区（不使用受PYTHONHASHSEED影响的hash()）
+        emp_keys = data['編號'].map(lambda emp_id: self.id_name_map.get(emp_id, str(emp_id)))
+        partition_ids = pd.util.hash_pandas_object(emp_keys.astype(str), index=False) % self.parallel_workers
+        partitions = [part for _, part in data.groupby(partition_ids.values, sort=True)]
+        
+        print(f"开始并行处理数据: {len(partitions)}个分区, {self.parallel_workers}个进程")
+        tasks = [(part, date_range, self.id_name_map, self.debug_mode) for part in partitions]
+        # 使用spawn启动子进程：在已运行过pyarrow线程池或UI后台线程的进程中fork可能死锁
+        with ProcessPoolExecutor(
+            max_workers=min(self.parallel_workers, len(partitions)),
+            mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            partition_results = list(executor.map(_process_partition, tasks))
+        
+        # 各分区结果已按(日期, 姓名)排序，归并后保持全局有序
+        results = list(heapq.merge(*partition_results, key=lambda x: (x['date'], x['emp_name'])))
+        print(f"并行数据处理完成，共生成{len(results)}条记录")
+        return results
+
+def _process_partition(task):
+    """进程池中处理单个分区，需为模块级函数以便序列化"""
+    data, date_range, id_name_map, debug_mode = task
+    processor = AccessLogProcessor(debug_mode=debug_mode)
+    processor.id_name_map = id_name_map
+    return processor.process_data(data, date_range)
@@ -0,0 +1,138 @@
+import pandas as pd
+
+class AttendanceRollup:
+    def __init__(self):
+        # 彙總粒度與pandas週期代碼的對應（週以週一為起始）
+        self.granularity_periods = {
+            'day': 'D',
+            'week': 'W-SUN',
+            'month': 'M'
+        }
+        # 彙總表頭中英文映射字典
+        self.column_mapping = {
+            'period': '期間',
+            'emp_name': '姓名',
+            'total_days': '總記錄數',
+            'normal_days': '正常',
+            'late_days': '遲到',
+            'early_leave_days': '早退',
+            'absent_days': '未進公司',
+            'out_days': '外出',
+            'holiday_days': '假日',
+            'late_minutes': '遲到分鐘',
+            'worked_hours': '工作時數'
+        }
+        self.count_columns = [
+            'total_days', 'normal_days', 'late_days', 'early_leave_days',
+            'absent_days', 'out_days', 'holiday_days', 'late_minutes', 'worked_hours'
+        ]
+        # 每日明細（員工 × 日期）與預先彙總好的各粒度結果
+        self.daily = None
+        self.cubes = {}
+
+    def build(self, all_processed_data, standard_check_in='09:00'):
+        """根據process_data的結果一次性建立員工 × 週/月的彙總立方體"""
+        self.cubes = {}
+        if not all_processed_data:
+            self.daily = None
+            return self
+
+        df = pd.DataFrame(all_processed_data, columns=['date', 'emp_name', 'check_in', 'check_out', 'status'])
+        status = df['status'].fillna('')
+
+        # 將HH:MM字串轉換為分鐘數，'-'等無效值轉為NaN
+        check_in_minutes = self._to_minutes(df['check_in'])
+        check_out_minutes = self._to_minutes(df['check_out'])
+        standard_minutes = self._to_minutes(pd.Series([standard_check_in])).iloc[0]
+
+        is_late = status.str.contains('遲到|迟到')
+        daily = pd.DataFrame({
+            'date': pd.to_datetime(df['date']),
+            'emp_name': df['emp_name'],
+            'total_days': 1,
+            'normal_days': (status == '正常').astype(int),
+            'late_days': is_late.astype(int),
+            'early_leave_days': status.str.contains('早退').astype(int),
+            'absent_days': status.str.contains('未進公司|未进公司').astype(int),
+            'out_days': (status == '外出').astype(int),
+            'holiday_days': status.str.contains('假日').astype(int),
+            'late_minutes': (check_in_minutes - standard_minutes).where(is_late, 0).fillna(0).clip(lower=0).astype(int),
+            'worked_hours': ((check_out_minutes - check_in_minutes).fillna(0).clip(lower=0) / 60).round(2)
+        })
+        self.daily = daily
+
+        # 預先計算每個粒度的彙總，之後查詢直接讀取
+        for granularity in self.granularity_periods:
+            self.cubes[granularity] = self._aggregate(granularity)
+        return self
+
+    def summary(self, granularity='month', emp_name=None):
+        """讀取指定粒度的彙總結果，granularity可為'day'、'week'、'month'或'all'"""
+        if self.daily is None:
+            return pd.DataFrame(columns=['period', 'emp_name'] + self.count_columns)
+
+        if granularity == 'all':
+            cube = self.totals()
+        elif granularity in self.cubes:
+            cube = self.cubes[granularity]
+        else:
+            raise ValueError(f"不支援的彙總粒度: {granularity}")
+
+        if emp_name is not None:
+            cube = cube[cube['emp_name'] == emp_name].reset_index(drop=True)
+        return cube
+
+    def totals(self):
+        """每位員工在整個資料範圍內的總計，由月彙總再次合計而來"""
+        if self.daily is None:
+            return pd.DataFrame(columns=['period', 'emp_name'] + self.count_columns)
+        cube = self.cubes['month'].groupby('emp_name', sort=True)[self.count_columns].sum().reset_index()
+        cube.insert(0, 'period', '全部')
+        cube['worked_hours'] = cube['worked_hours'].round(2)
+        return cube
+
+    def statistics_dataframe(self):
+        """每位員工總計，格式與Excel的統計資訊工作表相同（最後一行為總計）"""
+        totals = self.totals()
+        stats_df = pd.DataFrame({
+            '員工姓名': totals['emp_name'],
+            '總記錄數': totals['total_days'],
+            '正常': totals['normal_days'],
+            '遲到': totals['late_days'],
+            '早退': totals['early_leave_days'],
+            '未進公司': totals['absent_days'],
+            '外出': totals['out_days'],
+            '假日': totals['holiday_days']
+        })
+
+        # 新增總計行
+        total_row = {'員工姓名': '總計'}
+        total_row.update({col: int(stats_df[col].sum()) for col in stats_df.columns if col != '員工姓名'})
+        return pd.concat([stats_df, pd.DataFrame([total_row])], ignore_index=True)
+
+    def to_display_dataframe(self, granularity='month', emp_name=None):
+        """返回使用中文表頭的彙總DataFrame，供匯出與介面顯示"""
+        return self.summary(granularity, emp_name).rename(columns=self.column_mapping)
+
+    def _aggregate(self, granularity):
+        """將每日明細按員工與期間彙總"""
+        period = self.daily['date'].dt.to_period(self.granularity_periods[granularity])
+        if granularity == 'week':
+            # 週以起始日期表示，例如 2024-01-01
+            labels = period.dt.start_time.dt.strftime('%Y-%m-%d')
+        else:
+            labels = period.astype(str)
+
+        cube = (
+            self.daily.assign(period=labels)
+            .groupby(['period', 'emp_name'], sort=True)[self.count_columns]
+            .sum()
+            .reset_index()
+        )
+        cube['worked_hours'] = cube['worked_hours'].round(2)
+        return cube
+
+    def _to_minutes(self, time_series):
+        """將HH:MM格式的時間字串轉換為當天的分鐘數"""
+        parts = time_series.astype(str).str.extract(r'^(\d{1,2}):(\d{2})')
+        return pd.to_numeric(parts[0], errors='coerce') * 60 + pd.to_numeric(parts[1], errors='coerce')
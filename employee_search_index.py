@@ -0,0 +1,80 @@
+from bisect import bisect_left
+
+class EmployeeSearchIndex:
+    def __init__(self):
+        # 排序後的(小寫鍵, 姓名)列表，用於二分查找前綴
+        self.prefix_keys = []
+        # 單字元及雙字元片段 -> 包含該片段的姓名列表（按原始順序），用於子字串查找時縮小候選範圍
+        self.gram_index = {}
+        # 姓名 -> 可搜尋的鍵（姓名及其所有編號）
+        self.search_keys = {}
+        # 姓名 -> 編號列表
+        self.name_ids = {}
+
+    def build(self, employee_names, id_name_map):
+        """根據員工姓名列表和編號-姓名映射建立前綴與子字串索引"""
+        self.name_ids = {name: [] for name in employee_names}
+        for emp_id, name in id_name_map.items():
+            if name in self.name_ids:
+                self.name_ids[name].append(str(emp_id))
+
+        self.search_keys = {}
+        self.gram_index = {}
+        prefix_keys = []
+        for name, emp_ids in self.name_ids.items():
+            keys = [str(name).lower()] + [emp_id.lower() for emp_id in emp_ids]
+            self.search_keys[name] = keys
+            for key in keys:
+                prefix_keys.append((key, name))
+            for gram in self._grams(keys):
+                self.gram_index.setdefault(gram, []).append(name)
+        prefix_keys.sort()
+        self.prefix_keys = prefix_keys
+        return self
+
+    def search(self, query, limit=20):
+        """返回與查詢最匹配的姓名（最多limit個），可依姓名或編號查找
+
+        排序：完全相同 > 前綴匹配（按鍵排序） > 子字串匹配（按原始順序），
+        找到limit個結果即停止掃描，耗時與名冊大小基本無關
+        """
+        query = (query or '').strip().lower()
+        if not query:
+            return list(self.name_ids)[:limit]
+
+        # 使用dict保持插入順序並去重
+        matches = {}
+        # 前綴匹配：二分查找到第一個不小於query的鍵，完全相同的鍵會排在最前面
+        position = bisect_left(self.prefix_keys, (query, ''))
+        while position < len(self.prefix_keys) and len(matches) < limit:
+            key, name = self.prefix_keys[position]
+            if not key.startswith(query):
+                break
+            matches[name] = True
+            position += 1
+
+        # 子字串匹配：只掃描查詢中最少見片段的候選列表
+        if len(matches) < limit:
+            candidate_lists = [self.gram_index.get(gram, []) for gram in self._grams([query])]
+            for name in min(candidate_lists, key=len):
+                if name not in matches and any(query in key for key in self.search_keys[name]):
+                    matches[name] = True
+                    if len(matches) >= limit:
+                        break
+
+        return list(matches)
+
+    def _grams(self, keys):
+        """返回鍵中所有不重複的單字元及雙字元片段"""
+        grams = set()
+        for key in keys:
+            grams.update(key)
+            grams.update(key[i:i + 2] for i in range(len(key) - 1))
+        return grams
+
+    def display_text(self, name):
+        """下拉選項顯示的文字，包含編號方便辨識同名員工"""
+        emp_ids = self.name_ids.get(name)
+        if emp_ids:
+            return f"{name} ({', '.join(emp_ids)})"
+        return str(name)
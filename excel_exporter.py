@@ -1,6 +1,7 @@
 import pandas as pd
 import xlsxwriter
 import pandas as pd
+from attendance_rollup import AttendanceRollup
 
 class ExcelExporter:
     def __init__(self):
@@ -14,8 +15,12 @@ class ExcelExporter:
             'status': '狀態'
         }
         
-    def export_to_excel(self, file_path, all_processed_data):
-        """將數據導出到Excel文件，為每個員工建立一個工作表，按要求進行客製化設置"""
+    def export_to_excel(self, file_path, all_processed_data, rollup=None, occupancy=None):
+        """將數據導出到Excel文件，為每個員工建立一個工作表，按要求進行客製化設置
+        
+        若提供已建立的AttendanceRollup，會直接讀取其中的週/月彙總寫入額外工作表；
+        若提供已建立的OccupancyAnalyzer，會寫入每日峰值及各時段在場人數工作表
+        """
         # 建立一個ExcelWriter對象
         with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
             # 準備要導出的數據（移除不需要的列）
@@ -41,9 +46,22 @@ class ExcelExporter:
             employee_names = sorted(list(set([record['emp_name'] for record in all_processed_data])))
             
             # 建立統計工作表
-            stats_df = self._create_statistics_dataframe(all_processed_data)
+            stats_df = self._create_statistics_dataframe(all_processed_data, rollup)
             stats_df.to_excel(writer, sheet_name='統計資訊', index=False)
             
+            # 建立週/月彙總工作表（直接讀取預先彙總的結果）
+            extra_sheet_count = 0
+            if rollup is not None:
+                for granularity, sheet_name in [('week', '週統計'), ('month', '月統計')]:
+                    rollup.to_display_dataframe(granularity).to_excel(writer, sheet_name=sheet_name, index=False)
+                    extra_sheet_count += 1
+            
+            # 建立在場人數工作表
+            if occupancy is not None and occupancy.timeline is not None:
+                occupancy.daily_display_dataframe().to_excel(writer, sheet_name='每日在場人數', index=False)
+                occupancy.to_display_dataframe().to_excel(writer, sheet_name='時段在場人數', index=False)
+                extra_sheet_count += 2
+            
             # 為每個員工建立工作表
             for emp_name in employee_names:
                 # 過濾該員工的數據
@@ -55,7 +73,7 @@ class ExcelExporter:
                 # 建立自定義工作表
                 self._create_custom_worksheet(writer, sheet_name, emp_data)
             
-            print(f"成功導出{len(employee_names)+2}個工作表到Excel文件")
+            print(f"成功導出{len(employee_names)+2+extra_sheet_count}個工作表到Excel文件")
     
     def _create_custom_worksheet(self, writer, sheet_name, data_list):
         """建立客製化的工作表，實現凍結窗格、條件格式化等功能"""
@@ -142,60 +160,11 @@ class ExcelExporter:
             # 設定欄寬（加一點餘量，確保有足夠的顯示空間）
             worksheet.set_column(col_num, col_num, max_width + 5)  # 增加更多餘量以確保內容完整顯示
     
-    def _create_statistics_dataframe(self, all_processed_data):
-        """建立統計資訊DataFrame"""
-        # 按員工分組統計
-        employee_stats = []
-        employee_names = sorted(list(set([record['emp_name'] for record in all_processed_data])))
-        
-        for emp_name in employee_names:
-            emp_data = [record for record in all_processed_data if record['emp_name'] == emp_name]
-            
-            # 統計不同狀態的數量
-            status_counts = {}
-            for record in emp_data:
-                status = record['status']
-                status_counts[status] = status_counts.get(status, 0) + 1
-            
-            # 計算正常、遲到、早退的數量
-            normal_count = status_counts.get('正常', 0)
-            late_count = status_counts.get('遲到', 0) + status_counts.get('迟到', 0) + (status_counts.get('假日、遲到', 0) if '假日、遲到' in status_counts else 0)
-            early_leave_count = status_counts.get('早退', 0) + (status_counts.get('假日、早退', 0) if '假日、早退' in status_counts else 0)
-            absent_count = status_counts.get('未進公司', 0)
-            out_count = status_counts.get('外出', 0)
-            holiday_count = status_counts.get('假日', 0)
-            
-            # 新增到統計結果
-            employee_stats.append({
-                '員工姓名': emp_name,
-                '總記錄數': len(emp_data),
-                '正常': normal_count,
-                '遲到': late_count,
-                '早退': early_leave_count,
-                '未進公司': absent_count,
-                '外出': out_count,
-                '假日': holiday_count
-            })
-        
-        # 建立DataFrame
-        stats_df = pd.DataFrame(employee_stats)
-        
-        # 新增總計行
-        total_row = {
-            '員工姓名': '總計',
-            '總記錄數': stats_df['總記錄數'].sum(),
-            '正常': stats_df['正常'].sum(),
-            '遲到': stats_df['遲到'].sum(),
-            '早退': stats_df['早退'].sum(),
-            '未進公司': stats_df['未進公司'].sum(),
-            '外出': stats_df['外出'].sum(),
-            '假日': stats_df['假日'].sum()
-        }
-        
-        # 將總計行新增到DataFrame
-        stats_df = pd.concat([stats_df, pd.DataFrame([total_row])], ignore_index=True)
-        
-        return stats_df
+    def _create_statistics_dataframe(self, all_processed_data, rollup=None):
+        """建立統計資訊DataFrame，直接讀取出勤彙總的總計，與週/月統計使用相同的計數規則"""
+        if rollup is None:
+            rollup = AttendanceRollup().build(all_processed_data)
+        return rollup.statistics_dataframe()
 
 # 建立一個單例實例，方便其他模組直接使用
 excel_exporter = ExcelExporter()
\ No newline at end of file
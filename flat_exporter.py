@@ -0,0 +1,126 @@
+import os
+import csv
+import json
+import pandas as pd
+from excel_exporter import excel_exporter
+from attendance_rollup import AttendanceRollup
+
+class FlatFileExporter:
+    def __init__(self, chunk_size=10000):
+        # 與Excel匯出使用相同的表頭中英文映射
+        self.column_mapping = excel_exporter.column_mapping
+        self.columns_to_export = ['date', 'weekday', 'emp_name', 'check_in', 'check_out', 'status']
+        # 每批寫入的記錄數，控制記憶體佔用
+        self.chunk_size = chunk_size
+        # 副檔名與匯出方法的對應
+        self.writers = {
+            '.csv': self._write_csv,
+            '.jsonl': self._write_jsonl,
+            '.parquet': self._write_parquet
+        }
+
+    def supported_extensions(self):
+        """返回支援的副檔名（不含點）"""
+        return [ext.lstrip('.') for ext in self.writers]
+
+    def export(self, file_path, all_processed_data, rollup=None, occupancy=None):
+        """根據副檔名將處理結果串流寫入平面檔案，並在同目錄寫入統計表
+
+        返回寫入的檔案路徑列表
+        """
+        stem, ext = os.path.splitext(file_path)
+        ext = ext.lower()
+        if ext not in self.writers:
+            raise Exception(f"不支援的匯出格式: {ext}")
+        writer = self.writers[ext]
+
+        # 全部記錄：按批次轉換並寫入，不一次性建立整個DataFrame
+        header = [self.column_mapping[col] for col in self.columns_to_export]
+        writer(file_path, header, self._iter_record_chunks(all_processed_data))
+        written_files = [file_path]
+
+        # 統計資訊：與Excel的統計工作表相同，由出勤彙總的總計產生
+        stats_rollup = rollup if rollup is not None else AttendanceRollup().build(all_processed_data)
+        stats_df = stats_rollup.statistics_dataframe()
+        stats_path = f"{stem}_統計資訊{ext}"
+        writer(stats_path, list(stats_df.columns), self._iter_dataframe_chunks(stats_df))
+        written_files.append(stats_path)
+
+        # 週/月彙總（若已建立）
+        if rollup is not None:
+            for granularity, suffix in [('week', '週統計'), ('month', '月統計')]:
+                rollup_df = rollup.to_display_dataframe(granularity)
+                rollup_path = f"{stem}_{suffix}{ext}"
+                writer(rollup_path, list(rollup_df.columns), self._iter_dataframe_chunks(rollup_df))
+                written_files.append(rollup_path)
+
+        # 在場人數（若已建立）
+        if occupancy is not None and occupancy.timeline is not None:
+            for occupancy_df, suffix in [(occupancy.daily_display_dataframe(), '每日在場人數'),
+                                         (occupancy.to_display_dataframe(), '時段在場人數')]:
+                occupancy_path = f"{stem}_{suffix}{ext}"
+                writer(occupancy_path, list(occupancy_df.columns), self._iter_dataframe_chunks(occupancy_df))
+                written_files.append(occupancy_path)
+
+        print(f"成功導出{len(written_files)}個{ext.lstrip('.').upper()}文件")
+        return written_files
+
+    def _iter_record_chunks(self, all_processed_data):
+        """將處理結果按chunk_size切分，每批返回一個列值列表的列表"""
+        for start in range(0, len(all_processed_data), self.chunk_size):
+            chunk = all_processed_data[start:start + self.chunk_size]
+            yield [[record[col] for col in self.columns_to_export] for record in chunk]
+
+    def _iter_dataframe_chunks(self, df):
+        """將DataFrame按chunk_size切分，每批返回一個列值列表的列表"""
+        for start in range(0, len(df), self.chunk_size):
+            yield df.iloc[start:start + self.chunk_size].values.tolist()
+
+    def _write_csv(self, file_path, header, row_chunks):
+        """串流寫入CSV，使用utf-8-sig以便Excel正確識別中文"""
+        with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for rows in row_chunks:
+                writer.writerows(rows)
+
+    def _write_jsonl(self, file_path, header, row_chunks):
+        """串流寫入JSON Lines，每行一條記錄"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            for rows in row_chunks:
+                f.write(''.join(
+                    json.dumps(dict(zip(header, row)), ensure_ascii=False, default=self._json_default) + '\n'
+                    for row in rows
+                ))
+
+    def _write_parquet(self, file_path, header, row_chunks):
+        """按批次寫入Parquet的row group，需要安裝pyarrow"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("匯出Parquet需要安裝pyarrow: pip install pyarrow")
+
+        writer = None
+        try:
+            for rows in row_chunks:
+                table = pa.Table.from_pandas(pd.DataFrame(rows, columns=header), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(file_path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+            if writer is None:
+                # 沒有資料時仍寫出只含表頭的空檔案
+                empty = pa.Table.from_pandas(pd.DataFrame(columns=header).astype(str), preserve_index=False)
+                pq.write_table(empty, file_path)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _json_default(self, value):
+        """處理numpy數值等json無法直接序列化的類型"""
+        if hasattr(value, 'item'):
+            return value.item()
+        return str(value)
+
+# 建立一個單例實例，方便其他模組直接使用
+flat_exporter = FlatFileExporter()
@@ -0,0 +1,108 @@
+import pandas as pd
+
+class OccupancyAnalyzer:
+    def __init__(self, slot_minutes=15, mode='first_last'):
+        # 時段長度（分鐘）
+        self.slot_minutes = slot_minutes
+        # 'first_last'：每人每天第一次刷卡進入、最後一次刷卡離開
+        # 'paired'：每人每天的刷卡依序兩兩配對為進入/離開
+        self.mode = mode
+        self.column_mapping = {
+            'slot_start': '時段開始',
+            'occupancy': '在場人數'
+        }
+        self.daily_column_mapping = {
+            'date': '日期',
+            'peak_occupancy': '最高在場人數',
+            'peak_slot': '峰值時段',
+            'first_occupied': '首次有人',
+            'last_occupied': '最後有人'
+        }
+        self.timeline = None
+
+    def build(self, data, id_name_map=None):
+        """根據load_data得到的刷卡記錄計算每個時段的在場人數
+
+        data需包含'編號'、'datetime'和'date'欄位，返回以slot_start為欄位的DataFrame；
+        提供id_name_map時按編號對應的員工計算，同一員工的多張卡只算一人
+        """
+        swipes = None if data is None else data[['編號', 'date', 'datetime']].dropna()
+        if swipes is None or len(swipes) == 0:
+            self.timeline = pd.DataFrame(columns=['slot_start', 'occupancy'])
+            return self.timeline
+
+        slot = pd.Timedelta(minutes=self.slot_minutes)
+        # 與並行處理的分區方式相同：以編號對應的姓名識別員工，沒有對應時使用編號本身
+        id_name_map = id_name_map or {}
+        swipes = swipes.assign(employee=swipes['編號'].map(lambda emp_id: id_name_map.get(emp_id, str(emp_id))))
+        entries, exits = self._intervals(swipes)
+
+        # 進入時段+1，離開時段的下一個時段-1；刷卡所在的時段都算在場
+        entry_slots = entries.dt.floor(slot)
+        exit_slots = exits.dt.floor(slot) + slot
+        events = pd.concat([
+            pd.Series(1, index=entry_slots.values),
+            pd.Series(-1, index=exit_slots.values)
+        ])
+        deltas = events.groupby(level=0).sum()
+
+        # 補齊所有時段（從第一天00:00到最後一天24:00），再以累加得到在場人數
+        start = pd.Timestamp(swipes['datetime'].min()).normalize()
+        end = pd.Timestamp(swipes['datetime'].max()).normalize() + pd.Timedelta(days=1) - slot
+        all_slots = pd.date_range(start=start, end=end, freq=slot)
+        occupancy = deltas.reindex(all_slots, fill_value=0).cumsum()
+
+        self.timeline = pd.DataFrame({
+            'slot_start': all_slots,
+            'occupancy': occupancy.values.astype(int)
+        })
+        return self.timeline
+
+    def daily_peaks(self):
+        """每天的最高在場人數、峰值時段及首次/最後有人的時段"""
+        if self.timeline is None or len(self.timeline) == 0:
+            return pd.DataFrame(columns=list(self.daily_column_mapping))
+
+        timeline = self.timeline.assign(date=self.timeline['slot_start'].dt.strftime('%Y-%m-%d'))
+        peak_rows = timeline.loc[timeline.groupby('date', sort=True)['occupancy'].idxmax()]
+        occupied = timeline[timeline['occupancy'] > 0].groupby('date')['slot_start']
+
+        daily = pd.DataFrame({
+            'date': peak_rows['date'].values,
+            'peak_occupancy': peak_rows['occupancy'].values,
+            'peak_slot': peak_rows['slot_start'].dt.strftime('%H:%M').values
+        })
+        first_occupied = occupied.min().dt.strftime('%H:%M')
+        last_occupied = occupied.max().dt.strftime('%H:%M')
+        daily['first_occupied'] = daily['date'].map(first_occupied).fillna('-')
+        daily['last_occupied'] = daily['date'].map(last_occupied).fillna('-')
+        # 沒有人在場的日期不顯示峰值時段
+        daily.loc[daily['peak_occupancy'] == 0, 'peak_slot'] = '-'
+        return daily
+
+    def to_display_dataframe(self):
+        """返回使用中文表頭的時段在場人數，供匯出使用"""
+        timeline = self.timeline if self.timeline is not None else pd.DataFrame(columns=['slot_start', 'occupancy'])
+        timeline = timeline.assign(slot_start=timeline['slot_start'].dt.strftime('%Y-%m-%d %H:%M'))
+        return timeline.rename(columns=self.column_mapping)
+
+    def daily_display_dataframe(self):
+        """返回使用中文表頭的每日峰值，供匯出與介面顯示"""
+        return self.daily_peaks().rename(columns=self.daily_column_mapping)
+
+    def _intervals(self, swipes):
+        """將刷卡記錄轉換為(進入時間, 離開時間)兩個Series，swipes需包含'employee'欄位"""
+        if self.mode == 'first_last':
+            bounds = swipes.groupby(['employee', 'date'], sort=False)['datetime'].agg(['min', 'max'])
+            return bounds['min'], bounds['max']
+
+        if self.mode == 'paired':
+            swipes = swipes.sort_values(['employee', 'datetime'], kind='mergesort')
+            # 每人每天的刷卡序號：偶數為進入，奇數為離開
+            order = swipes.groupby(['employee', 'date'], sort=False).cumcount()
+            pair_id = [swipes['employee'].values, swipes['date'].values, (order // 2).values]
+            pairs = swipes['datetime'].groupby(pair_id, sort=False).agg(['min', 'max'])
+            # 最後一筆沒有配對的刷卡視為只在該時段在場
+            return pairs['min'], pairs['max']
+
+        raise ValueError(f"不支援的在場人數計算方式: {self.mode}")
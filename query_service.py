@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from access_log_processor import AccessLogProcessor
+from attendance_rollup import AttendanceRollup
+
+class AttendanceQueryService:
+    def __init__(self, file_paths, cache_size=256, dedup_window_seconds=30, csv_engine='auto', parallel_workers=1):
+        self.file_paths = list(file_paths)
+        # 回應快取（LRU），鍵為標準化後的路徑與查詢參數
+        self.cache_size = cache_size
+        self.response_cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self.processor = AccessLogProcessor(
+            dedup_window_seconds=dedup_window_seconds,
+            csv_engine=csv_engine,
+            parallel_workers=parallel_workers
+        )
+        self.rollup = AttendanceRollup()
+        self.all_processed_data = []
+        # 查詢索引：值為all_processed_data中的位置列表（位置本身已按日期、姓名排序）
+        self.name_index = {}
+        self.id_index = {}
+        self.date_index = {}
+
+        self.server = None
+        self.server_thread = None
+
+        # 路徑與處理方法的對應
+        self.routes = {
+            '/health': self._handle_health,
+            '/employees': self._handle_employees,
+            '/records': self._handle_records,
+            '/statistics': self._handle_statistics,
+            '/rollup': self._handle_rollup
+        }
+        # 不寫入快取的路徑（內容隨快取狀態變化）
+        self.uncached_paths = {'/health'}
+
+    def load(self):
+        """一次性載入並處理所有日誌檔案，建立索引與彙總"""
+        data = self.processor.load_files(self.file_paths)
+        self.all_processed_data = self.processor.process_data(data)
+        self.rollup.build(self.all_processed_data)
+
+        self.name_index = {}
+        self.id_index = {}
+        self.date_index = {}
+        for position, record in enumerate(self.all_processed_data):
+            self.name_index.setdefault(record['emp_name'], []).append(position)
+            self.date_index.setdefault(record['date'], []).append(position)
+            if record['emp_id'] != '':
+                self.id_index.setdefault(str(record['emp_id']), []).append(position)
+
+        # 資料已更新，清空快取
+        with self.cache_lock:
+            self.response_cache.clear()
+        print(f"查詢服務已載入{len(self.all_processed_data)}條記錄，員工{len(self.name_index)}人")
+        return self
+
+    def query(self, path, params=None):
+        """處理一個查詢，返回(狀態碼, 可JSON序列化的結果)；HTTP處理器與測試共用"""
+        params = params or {}
+        handler = self.routes.get(path)
+        if handler is None:
+            return 404, {'error': f"未知的路徑: {path}"}
+        if path in self.uncached_paths:
+            return 200, handler(params)
+
+        cache_key = (path, tuple(sorted(params.items())))
+        with self.cache_lock:
+            if cache_key in self.response_cache:
+                self.response_cache.move_to_end(cache_key)
+                self.cache_hits += 1
+                return self.response_cache[cache_key]
+            self.cache_misses += 1
+
+        try:
+            result = (200, handler(params))
+        except ValueError as e:
+            # 參數錯誤不寫入快取
+            return 400, {'error': str(e)}
+
+        with self.cache_lock:
+            self.response_cache[cache_key] = result
+            if len(self.response_cache) > self.cache_size:
+                self.response_cache.popitem(last=False)
+        return result
+
+    def start(self, host='127.0.0.1', port=8765):
+        """在背景執行緒啟動HTTP服務，port為0時自動選擇可用埠，返回實際位址"""
+        service = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, result = service.query(url.path.rstrip('/') or '/', params)
+                body = json.dumps(result, ensure_ascii=False, default=service._json_default).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 只在debug模式下輸出請求日誌
+                if service.processor.debug_mode:
+                    super().log_message(format, *args)
+
+        self.server = ThreadingHTTPServer((host, port), RequestHandler)
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        address = self.server.server_address
+        print(f"查詢服務已啟動: http://{address[0]}:{address[1]}")
+        return address
+
+    def stop(self):
+        """停止HTTP服務"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server_thread.join()
+            self.server = None
+            self.server_thread = None
+
+    def _handle_health(self, params):
+        return {
+            'records': len(self.all_processed_data),
+            'employees': len(self.name_index),
+            'files': self.file_paths,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses
+        }
+
+    def _handle_employees(self, params):
+        id_by_name = {}
+        for emp_id, positions in self.id_index.items():
+            id_by_name.setdefault(self.all_processed_data[positions[0]]['emp_name'], emp_id)
+        return [{'emp_name': name, 'emp_id': id_by_name.get(name, '')} for name in sorted(self.name_index)]
+
+    def _handle_records(self, params):
+        """篩選記錄，支援name、emp_id、start、end、status、limit、offset參數"""
+        candidates = None
+        if 'name' in params:
+            candidates = self.name_index.get(params['name'], [])
+        if 'emp_id' in params:
+            id_positions = self.id_index.get(params['emp_id'], [])
+            # 透過編號找到姓名，以包含該員工的"未進公司"記錄（這些記錄沒有編號）
+            if id_positions:
+                name_positions = self.name_index[self.all_processed_data[id_positions[0]]['emp_name']]
+            else:
+                name_positions = []
+            candidates = name_positions if candidates is None else sorted(set(candidates) & set(name_positions))
+        start = params.get('start')
+        end = params.get('end')
+        if candidates is None and (start or end):
+            # 只按日期篩選時使用日期索引，記錄本身按日期排序，位置依序相接
+            candidates = [
+                position
+                for date in sorted(self.date_index)
+                if (not start or date >= start) and (not end or date <= end)
+                for position in self.date_index[date]
+            ]
+        if candidates is None:
+            candidates = range(len(self.all_processed_data))
+
+        status = params.get('status')
+        limit = self._parse_int(params, 'limit', 1000)
+        offset = self._parse_int(params, 'offset', 0)
+
+        matched = []
+        for position in candidates:
+            record = self.all_processed_data[position]
+            # 日期為YYYY-MM-DD格式字串，可直接比較
+            if start and record['date'] < start:
+                continue
+            if end and record['date'] > end:
+                continue
+            if status and status not in record['status']:
+                continue
+            matched.append(record)
+
+        return {
+            'total': len(matched),
+            'offset': offset,
+            'records': matched[offset:offset + limit]
+        }
+
+    def _handle_statistics(self, params):
+        """與Excel統計工作表相同的每位員工統計，直接讀取預先彙總的總計"""
+        if not self.all_processed_data:
+            return []
+        stats_df = self.rollup.statistics_dataframe()
+        if 'name' in params:
+            stats_df = stats_df[stats_df['員工姓名'] == params['name']]
+        return stats_df.to_dict(orient='records')
+
+    def _handle_rollup(self, params):
+        """讀取預先彙總的週/月結果，granularity可為day、week、month或all"""
+        granularity = params.get('granularity', 'month')
+        return self.rollup.summary(granularity, params.get('name')).to_dict(orient='records')
+
+    def _parse_int(self, params, key, default):
+        try:
+            value = int(params.get(key, default))
+        except (TypeError, ValueError):
+            raise ValueError(f"參數{key}必須是整數")
+        if value < 0:
+            raise ValueError(f"參數{key}不能為負數")
+        return value
+
+    def _json_default(self, value):
+        """處理numpy數值等json無法直接序列化的類型"""
+        if hasattr(value, 'item'):
+            return value.item()
+        return str(value)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="門禁日誌查詢服務：載入一次日誌，透過本機HTTP/JSON提供查詢")
+    parser.add_argument('files', nargs='+', help="門禁日誌CSV文件")
+    parser.add_argument('--host', default='127.0.0.1', help="監聽位址（預設只允許本機存取）")
+    parser.add_argument('--port', type=int, default=8765, help="監聽埠")
+    parser.add_argument('--cache-size', type=int, default=256, help="回應快取的最大條目數")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="處理資料的進程數")
+    parser.add_argument('--csv-engine', choices=['auto', 'pandas', 'pyarrow'], default='auto', help="CSV解析引擎")
+    args = parser.parse_args(argv)
+
+    service = AttendanceQueryService(args.files, cache_size=args.cache_size, csv_engine=args.csv_engine, parallel_workers=args.workers).load()
+    service.start(args.host, args.port)
+    try:
+        service.server_thread.join()
+    except KeyboardInterrupt:
+        service.stop()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
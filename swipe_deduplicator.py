@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+class SwipeDeduplicator:
+    def __init__(self, window_seconds=30):
+        # 同一編號在此秒數內的連續刷卡合併為一組（重試、重複刷卡、多個讀卡機），只保留首尾
+        # 設為0則只移除完全重複的記錄
+        self.window_seconds = window_seconds
+        # 判斷完全重複時使用的欄位
+        self.duplicate_subset = ['編號', 'datetime']
+        # 最近一次處理的統計
+        self.last_stats = {'input': 0, 'exact_duplicates': 0, 'burst_collapsed': 0, 'output': 0}
+
+    def deduplicate(self, df):
+        """移除完全重複的刷卡記錄並合併短時間內的連續刷卡，返回新的DataFrame
+
+        df需包含load_data產生的'datetime'和'編號'欄位；
+        窗口從每個群組的第一筆開始計算，超出窗口的刷卡會成為下一個群組的第一筆；
+        每個群組保留第一筆和最後一筆，上班/下班時間不會因合併而提前或延後
+        """
+        input_count = len(df)
+
+        # 1. 移除完全重複的記錄（例如多個匯出檔案時間範圍重疊）
+        deduped = df.drop_duplicates(subset=self.duplicate_subset, keep='first')
+        exact_duplicates = input_count - len(deduped)
+
+        # 2. 按編號和時間排序後合併連續刷卡
+        burst_collapsed = 0
+        if self.window_seconds > 0 and len(deduped) > 1:
+            deduped = deduped.sort_values(['編號', 'datetime'], kind='mergesort')
+            keep = self._burst_keep_mask(
+                pd.factorize(deduped['編號'])[0],
+                deduped['datetime'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            )
+            burst_collapsed = int((~keep).sum())
+            deduped = deduped[keep]
+
+        self.last_stats = {
+            'input': input_count,
+            'exact_duplicates': exact_duplicates,
+            'burst_collapsed': burst_collapsed,
+            'output': len(deduped)
+        }
+        print(f"刷卡去重: 輸入{input_count}筆, 移除完全重複{exact_duplicates}筆, "
+              f"合併{self.window_seconds}秒內連續刷卡{burst_collapsed}筆, 剩餘{len(deduped)}筆")
+        return deduped
+
+    def _burst_keep_mask(self, card_codes, times_ns):
+        """返回需要保留的刷卡（已按編號和時間排序）
+
+        與前一筆間隔超過窗口或換了編號的刷卡一定保留（向量化判斷）；
+        只有連續間隔都在窗口內的片段才逐筆檢查與該群組第一筆的距離，
+        最後再補回每個群組的最後一筆
+        """
+        window_ns = int(self.window_seconds * 1_000_000_000)
+        keep = np.ones(len(times_ns), dtype=bool)
+        chained = np.zeros(len(times_ns), dtype=bool)
+        chained[1:] = (card_codes[1:] == card_codes[:-1]) & (np.diff(times_ns) <= window_ns)
+
+        anchor = 0
+        for i in np.flatnonzero(chained):
+            # 前一筆不在片段內時，它就是本群組保留的第一筆
+            if not chained[i - 1]:
+                anchor = times_ns[i - 1]
+            if times_ns[i] - anchor <= window_ns:
+                keep[i] = False
+            else:
+                anchor = times_ns[i]
+
+        # 被合併的刷卡中，下一筆不再被合併（或已是最後一筆）的就是群組的最後一筆
+        collapsed = ~keep
+        keep[collapsed & np.append(keep[1:], True)] = True
+        return keep
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+from access_log_processor import AccessLogProcessor
+
+
+def write_ragged_log(tmp_path):
+    lines = ['序號,記錄時間,編號,姓名,允許通行,詳細資訊']
+    number = 0
+    for day in range(1, 6):
+        for emp_id, name in [(1003, '林小華'), (1020, '張志強')]:
+            for record_time in ['08:50:00', '18:10:00']:
+                number += 1
+                # 資料列比表頭多一欄，會產生临时列
+                lines.append(f'{number},2024-01-0{day} {record_time},{emp_id},{name},是,門1,x')
+    lines.append('99997,2024-01-05 09:10:00,,')
+    lines.append('99996,2024-01-05 09:12:00,1003')
+    lines.append('99995,2024-01-05 09:14:00,1020,張志強,是,門1,x,多餘欄位')
+    csv_path = tmp_path / 'ragged.csv'
+    csv_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(csv_path)
+
+
+def test_arrow_engine_matches_pandas_on_ragged_file(tmp_path):
+    pytest.importorskip('pyarrow')
+    csv_path = write_ragged_log(tmp_path)
+
+    results = {}
+    for engine in ['pandas', 'pyarrow']:
+        processor = AccessLogProcessor(csv_engine=engine)
+        data = processor.load_files([csv_path])
+        results[engine] = processor.process_data(data)
+
+    assert results['pyarrow'] == results['pandas']
+    assert {record['emp_name'] for record in results['pyarrow']} == {'林小華', '張志強'}
+
+
+def test_arrow_short_rows_are_padded_with_nulls(tmp_path):
+    pytest.importorskip('pyarrow')
+    csv_path = write_ragged_log(tmp_path)
+
+    df = AccessLogProcessor(csv_engine='pyarrow').load_data(csv_path)
+    padded = df[df['序號'].isin([99996, 99997])].set_index('序號')
+    assert pd.isna(padded.loc[99997, '編號'])
+    assert padded.loc[99996, '編號'] == 1003
+
+
+def test_arrow_engine_returns_same_dtypes_as_pandas(tmp_path):
+    pytest.importorskip('pyarrow')
+    csv_path = write_ragged_log(tmp_path)
+
+    arrow_df = AccessLogProcessor(csv_engine='pyarrow').load_data(csv_path)
+    pandas_df = AccessLogProcessor(csv_engine='pandas').load_data(csv_path)
+    # Arrow-backed的列會讓process_data的逐組處理變慢，因此需轉為numpy-backed
+    assert dict(arrow_df.dtypes.astype(str)) == dict(pandas_df.dtypes.astype(str))
+
+
+def test_parallel_processing_matches_single_process(tmp_path):
+    csv_path = write_ragged_log(tmp_path)
+
+    serial = AccessLogProcessor(csv_engine='pandas')
+    parallel = AccessLogProcessor(csv_engine='pandas', parallel_workers=2, parallel_min_rows=1)
+    expected = serial.process_data(serial.load_files([csv_path]))
+    assert parallel.process_data(parallel.load_files([csv_path])) == expected
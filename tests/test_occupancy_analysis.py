@@ -0,0 +1,41 @@
+import pandas as pd
+from occupancy_analysis import OccupancyAnalyzer
+
+
+def make_swipes(rows):
+    df = pd.DataFrame(rows, columns=['編號', '記錄時間'])
+    df['datetime'] = pd.to_datetime(df['記錄時間'])
+    df['date'] = df['datetime'].dt.date
+    return df
+
+
+def test_employee_with_two_cards_counts_once():
+    df = make_swipes([
+        (1005, '2024-01-05 09:00:00'),
+        (1255, '2024-01-05 10:00:00'),
+        (1005, '2024-01-05 17:00:00'),
+        (1255, '2024-01-05 18:00:00'),
+    ])
+    analyzer = OccupancyAnalyzer(slot_minutes=15)
+    analyzer.build(df, {1005: '員工5', 1255: '員工5'})
+    daily = analyzer.daily_peaks()
+    assert daily['peak_occupancy'].tolist() == [1]
+    assert daily['first_occupied'].tolist() == ['09:00']
+    assert daily['last_occupied'].tolist() == ['18:00']
+
+
+def test_unmapped_cards_are_counted_separately():
+    df = make_swipes([
+        (1005, '2024-01-05 09:00:00'),
+        (1255, '2024-01-05 09:05:00'),
+    ])
+    analyzer = OccupancyAnalyzer(slot_minutes=15)
+    analyzer.build(df)
+    assert analyzer.daily_peaks()['peak_occupancy'].tolist() == [2]
+
+
+def test_no_valid_swipes_gives_empty_timeline():
+    df = pd.DataFrame({'編號': [1005], 'date': [None], 'datetime': [pd.NaT]})
+    timeline = OccupancyAnalyzer().build(df)
+    assert len(timeline) == 0
+    assert len(OccupancyAnalyzer().build(None)) == 0
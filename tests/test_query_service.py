@@ -0,0 +1,77 @@
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+from query_service import AttendanceQueryService
+
+
+@pytest.fixture
+def service(tmp_path):
+    lines = ['序號,記錄時間,編號,姓名,允許通行,詳細資訊']
+    swipes = [
+        ('2024-01-01 08:50:00', 1001, '王小明'), ('2024-01-01 18:10:00', 1001, '王小明'),
+        ('2024-01-01 09:20:00', 1002, '陳大文'), ('2024-01-01 17:30:00', 1002, '陳大文'),
+        ('2024-01-02 08:55:00', 1001, '王小明'), ('2024-01-02 18:05:00', 1001, '王小明'),
+        ('2024-01-02 12:00:00', 1002, '陳大文'),
+    ]
+    for number, (record_time, emp_id, name) in enumerate(swipes, start=1):
+        lines.append(f'{number},{record_time},{emp_id},{name},是,門1')
+    csv_path = tmp_path / 'log.csv'
+    csv_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    service = AttendanceQueryService([str(csv_path)], csv_engine='pandas').load()
+    host, port = service.start(port=0)
+    service.base_url = f'http://{host}:{port}'
+    yield service
+    service.stop()
+
+
+def get(service, path, **params):
+    url = service.base_url + path
+    if params:
+        url += '?' + urllib.parse.urlencode(params)
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_records_filtering(service):
+    status, body = get(service, '/records', name='陳大文')
+    assert status == 200
+    assert body['total'] == 2
+    assert [record['status'] for record in body['records']] == ['遲到、早退', '外出']
+
+    status, body = get(service, '/records', emp_id='1001', start='2024-01-02')
+    assert status == 200
+    assert [(record['date'], record['emp_name']) for record in body['records']] == [('2024-01-02', '王小明')]
+
+    status, body = get(service, '/records', status='遲到', limit=1)
+    assert body['total'] == 1 and len(body['records']) == 1
+
+
+def test_statistics_match_rollup(service):
+    status, body = get(service, '/statistics')
+    assert status == 200
+    assert body[-1]['員工姓名'] == '總計'
+    assert body[-1]['遲到'] == 1 and body[-1]['早退'] == 1 and body[-1]['外出'] == 1
+
+
+def test_bad_parameters_return_400(service):
+    assert get(service, '/records', limit='x')[0] == 400
+    assert get(service, '/records', limit='-1')[0] == 400
+    assert get(service, '/rollup', granularity='year')[0] == 400
+
+
+def test_unknown_path_returns_404(service):
+    assert get(service, '/nope')[0] == 404
+
+
+def test_repeated_request_is_served_from_cache(service):
+    get(service, '/rollup', granularity='week')
+    hits_before = get(service, '/health')[1]['cache_hits']
+    get(service, '/rollup', granularity='week')
+    assert get(service, '/health')[1]['cache_hits'] == hits_before + 1
@@ -0,0 +1,56 @@
+import pandas as pd
+from swipe_deduplicator import SwipeDeduplicator
+
+
+def make_swipes(rows):
+    df = pd.DataFrame(rows, columns=['編號', '記錄時間'])
+    df['datetime'] = pd.to_datetime(df['記錄時間'])
+    df['date'] = df['datetime'].dt.date
+    return df
+
+
+def test_window_is_measured_from_first_swipe_of_burst():
+    df = make_swipes([
+        (1001, '2024-01-05 09:00:00'),
+        (1001, '2024-01-05 09:00:10'),
+        (1001, '2024-01-05 09:00:20'),
+        (1001, '2024-01-05 09:00:35'),
+    ])
+    result = SwipeDeduplicator(window_seconds=30).deduplicate(df)
+    assert list(result['記錄時間']) == ['2024-01-05 09:00:00', '2024-01-05 09:00:20', '2024-01-05 09:00:35']
+
+
+def test_burst_keeps_last_swipe_so_check_out_does_not_move():
+    df = make_swipes([
+        (1001, '2024-01-05 08:55:00'),
+        (1001, '2024-01-05 17:59:50'),
+        (1001, '2024-01-05 18:00:05'),
+    ])
+    result = SwipeDeduplicator(window_seconds=30).deduplicate(df)
+    assert result['datetime'].min() == pd.Timestamp('2024-01-05 08:55:00')
+    assert result['datetime'].max() == pd.Timestamp('2024-01-05 18:00:05')
+
+
+def test_chained_swipes_do_not_collapse_the_whole_day():
+    times = pd.date_range('2024-01-05 09:00:00', '2024-01-05 18:00:00', freq='10s')
+    df = make_swipes([(1001, str(t)) for t in times])
+    deduplicator = SwipeDeduplicator(window_seconds=30)
+    kept = deduplicator.deduplicate(df)['datetime']
+    assert kept.min() == pd.Timestamp('2024-01-05 09:00:00')
+    assert kept.max() == pd.Timestamp('2024-01-05 18:00:00')
+    # 每40秒一組（0、10、20、30秒），每組只保留首尾兩筆
+    assert deduplicator.last_stats['burst_collapsed'] == len(times) // 4 * 2
+
+
+def test_exact_duplicates_and_other_cards_are_handled():
+    df = make_swipes([
+        (1001, '2024-01-05 09:00:00'),
+        (1001, '2024-01-05 09:00:00'),
+        (1002, '2024-01-05 09:00:05'),
+        (1001, '2024-01-05 18:00:00'),
+    ])
+    deduplicator = SwipeDeduplicator(window_seconds=30)
+    result = deduplicator.deduplicate(df)
+    assert len(result) == 3
+    assert deduplicator.last_stats['exact_duplicates'] == 1
+    assert deduplicator.last_stats['burst_collapsed'] == 0